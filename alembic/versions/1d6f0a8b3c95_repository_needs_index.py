@@ -0,0 +1,32 @@
+"""Repository needs_index flag
+
+Revision ID: 1d6f0a8b3c95
+Revises: e27b94d1a6f0
+Create Date: 2026-10-18 14:02:16.284611
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "1d6f0a8b3c95"
+down_revision = "e27b94d1a6f0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "repositories",
+        sa.Column(
+            "needs_index",
+            sa.Boolean(),
+            nullable=False,
+            server_default=sa.false(),
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("repositories", "needs_index")
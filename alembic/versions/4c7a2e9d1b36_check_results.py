@@ -0,0 +1,139 @@
+"""Check results
+
+Revision ID: 4c7a2e9d1b36
+Revises: 9b2e5c4f7d18
+Create Date: 2026-10-18 16:05:42.183290
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4c7a2e9d1b36"
+down_revision = "9b2e5c4f7d18"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "check_results",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("repository_id", sa.Integer(), nullable=False),
+        sa.Column("record_id", sa.Text(), nullable=False),
+        sa.Column(
+            "missing_packages",
+            postgresql.ARRAY(sa.Text()),
+            nullable=False,
+        ),
+        sa.Column(
+            "missing_modular_packages",
+            postgresql.ARRAY(sa.Text()),
+            nullable=False,
+        ),
+        sa.Column(
+            "missing_modules",
+            postgresql.ARRAY(sa.Text()),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(
+            ["repository_id"],
+            ["repositories.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "repository_id",
+            "record_id",
+            name="check_results_repository_id_record_id_key",
+        ),
+    )
+    for column in (
+        "missing_packages",
+        "missing_modular_packages",
+        "missing_modules",
+    ):
+        op.create_index(
+            f"check_results_{column}_idx",
+            "check_results",
+            [column],
+            postgresql_using="gin",
+        )
+    op.execute(
+        """
+        INSERT INTO check_results (
+            repository_id,
+            record_id,
+            missing_packages,
+            missing_modular_packages,
+            missing_modules
+        )
+        SELECT
+            repositories.id,
+            result.key,
+            ARRAY(
+                SELECT jsonb_array_elements_text(
+                    result.value -> 'missing_packages'
+                )
+            ),
+            ARRAY(
+                SELECT jsonb_array_elements_text(
+                    result.value -> 'missing_modular_packages'
+                )
+            ),
+            ARRAY(
+                SELECT jsonb_array_elements_text(
+                    result.value -> 'missing_modules'
+                )
+            )
+        FROM repositories, jsonb_each(repositories.check_result) AS result
+        WHERE jsonb_typeof(repositories.check_result) = 'object'
+        """
+    )
+    op.drop_column("repositories", "check_result")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "repositories",
+        sa.Column(
+            "check_result",
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=True,
+        ),
+    )
+    op.execute(
+        """
+        UPDATE repositories
+        SET check_result = results.check_result
+        FROM (
+            SELECT
+                repository_id,
+                jsonb_object_agg(
+                    record_id,
+                    jsonb_build_object(
+                        'missing_packages',
+                        to_jsonb(missing_packages),
+                        'missing_modular_packages',
+                        to_jsonb(missing_modular_packages),
+                        'missing_modules',
+                        to_jsonb(missing_modules)
+                    )
+                ) AS check_result
+            FROM check_results
+            GROUP BY repository_id
+        ) AS results
+        WHERE repositories.id = results.repository_id
+        """
+    )
+    for column in (
+        "missing_modules",
+        "missing_modular_packages",
+        "missing_packages",
+    ):
+        op.drop_index(
+            f"check_results_{column}_idx",
+            table_name="check_results",
+        )
+    op.drop_table("check_results")
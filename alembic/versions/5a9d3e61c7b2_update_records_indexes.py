@@ -0,0 +1,48 @@
+"""Update records indexes
+
+Revision ID: 5a9d3e61c7b2
+Revises: c41e7b0f25d3
+Create Date: 2026-10-18 12:41:07.530814
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5a9d3e61c7b2"
+down_revision = "c41e7b0f25d3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM update_records a
+        USING update_records b
+        WHERE a.repository_id = b.repository_id
+            AND a.record_id = b.record_id
+            AND a.id < b.id
+        """
+    )
+    op.create_unique_constraint(
+        "update_records_repository_id_record_id_key",
+        "update_records",
+        ["repository_id", "record_id"],
+    )
+    op.create_index(
+        "repositories_is_old_check_ts_idx",
+        "repositories",
+        ["is_old", "check_ts"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "repositories_is_old_check_ts_idx",
+        table_name="repositories",
+    )
+    op.drop_constraint(
+        "update_records_repository_id_record_id_key",
+        "update_records",
+        type_="unique",
+    )
@@ -0,0 +1,27 @@
+"""Repository distribution
+
+Revision ID: 7e3a9c05d4f2
+Revises: 4c7a2e9d1b36
+Create Date: 2026-10-18 17:21:08.635471
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7e3a9c05d4f2"
+down_revision = "4c7a2e9d1b36"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "repositories",
+        sa.Column("distribution", sa.Text(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("repositories", "distribution")
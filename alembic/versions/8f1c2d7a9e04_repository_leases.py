@@ -0,0 +1,32 @@
+"""Repository leases
+
+Revision ID: 8f1c2d7a9e04
+Revises: 3b423d51f2d8
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8f1c2d7a9e04"
+down_revision = "3b423d51f2d8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "repositories",
+        sa.Column("lease_owner", sa.Text(), nullable=True),
+    )
+    op.add_column(
+        "repositories",
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("repositories", "lease_expires_at")
+    op.drop_column("repositories", "lease_owner")
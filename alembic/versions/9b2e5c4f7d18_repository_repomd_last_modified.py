@@ -0,0 +1,27 @@
+"""Repository repomd_last_modified
+
+Revision ID: 9b2e5c4f7d18
+Revises: 1d6f0a8b3c95
+Create Date: 2026-10-18 14:48:53.601927
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9b2e5c4f7d18"
+down_revision = "1d6f0a8b3c95"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "repositories",
+        sa.Column("repomd_last_modified", sa.Text(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("repositories", "repomd_last_modified")
@@ -0,0 +1,32 @@
+"""Repository is_active
+
+Revision ID: a3f8d2c61e57
+Revises: 7e3a9c05d4f2
+Create Date: 2026-10-18 18:02:47.519034
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a3f8d2c61e57"
+down_revision = "7e3a9c05d4f2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "repositories",
+        sa.Column(
+            "is_active",
+            sa.Boolean(),
+            nullable=False,
+            server_default=sa.true(),
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("repositories", "is_active")
@@ -0,0 +1,32 @@
+"""Repository repodata types
+
+Revision ID: c41e7b0f25d3
+Revises: 8f1c2d7a9e04
+Create Date: 2026-10-18 10:03:54.118342
+
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c41e7b0f25d3"
+down_revision = "8f1c2d7a9e04"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "repositories",
+        sa.Column(
+            "repodata_types",
+            postgresql.ARRAY(sa.Text()),
+            nullable=True,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("repositories", "repodata_types")
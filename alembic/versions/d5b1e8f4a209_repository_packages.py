@@ -0,0 +1,38 @@
+"""Repository packages
+
+Revision ID: d5b1e8f4a209
+Revises: a3f8d2c61e57
+Create Date: 2026-10-18 19:14:36.281940
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d5b1e8f4a209"
+down_revision = "a3f8d2c61e57"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "repository_packages",
+        sa.Column("repository_id", sa.Integer(), nullable=False),
+        sa.Column("nevra", sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["repository_id"],
+            ["repositories.id"],
+        ),
+        sa.PrimaryKeyConstraint("repository_id", "nevra"),
+    )
+    op.add_column(
+        "repositories",
+        sa.Column("packages_checksum", sa.Text(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("repositories", "packages_checksum")
+    op.drop_table("repository_packages")
@@ -0,0 +1,65 @@
+"""Adaptive check intervals
+
+Revision ID: e27b94d1a6f0
+Revises: 5a9d3e61c7b2
+Create Date: 2026-10-18 13:26:42.917350
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e27b94d1a6f0"
+down_revision = "5a9d3e61c7b2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "repositories",
+        sa.Column("next_check_ts", sa.DateTime(), nullable=True),
+    )
+    op.add_column(
+        "repositories",
+        sa.Column("check_interval", sa.Integer(), nullable=True),
+    )
+    op.add_column(
+        "repositories",
+        sa.Column("metadata_changed_ts", sa.DateTime(), nullable=True),
+    )
+    op.add_column(
+        "repositories",
+        sa.Column(
+            "priority",
+            sa.Integer(),
+            nullable=False,
+            server_default="0",
+        ),
+    )
+    op.drop_index(
+        "repositories_is_old_check_ts_idx",
+        table_name="repositories",
+    )
+    op.create_index(
+        "repositories_is_old_next_check_ts_idx",
+        "repositories",
+        ["is_old", "next_check_ts"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "repositories_is_old_next_check_ts_idx",
+        table_name="repositories",
+    )
+    op.create_index(
+        "repositories_is_old_check_ts_idx",
+        "repositories",
+        ["is_old", "check_ts"],
+    )
+    op.drop_column("repositories", "priority")
+    op.drop_column("repositories", "metadata_changed_ts")
+    op.drop_column("repositories", "check_interval")
+    op.drop_column("repositories", "next_check_ts")
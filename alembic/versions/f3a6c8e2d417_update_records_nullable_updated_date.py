@@ -0,0 +1,35 @@
+"""Update records nullable updated_date
+
+Revision ID: f3a6c8e2d417
+Revises: d5b1e8f4a209
+Create Date: 2026-10-18 21:05:12.604318
+
+"""
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f3a6c8e2d417"
+down_revision = "d5b1e8f4a209"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "update_records",
+        "updated_date",
+        existing_type=sa.DateTime(),
+        nullable=True,
+    )
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM update_records WHERE updated_date IS NULL")
+    op.alter_column(
+        "update_records",
+        "updated_date",
+        existing_type=sa.DateTime(),
+        nullable=False,
+    )
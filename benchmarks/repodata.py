@@ -0,0 +1,164 @@
+import datetime
+import gzip
+import random
+from pathlib import Path
+
+import createrepo_c
+import yaml
+
+ARCH = "x86_64"
+RELEASE = "1.el8"
+
+
+def get_package_name(number: int) -> str:
+    return f"bench-package-{number}"
+
+
+def get_package_nevra(number: int, release: str = RELEASE) -> str:
+    return f"{get_package_name(number)}-0:1.0-{release}.{ARCH}"
+
+
+def write_packages(repodata_path: Path, packages: int):
+    primary = createrepo_c.PrimaryXmlFile(
+        str(Path(repodata_path, "primary.xml.gz")),
+    )
+    filelists = createrepo_c.FilelistsXmlFile(
+        str(Path(repodata_path, "filelists.xml.gz")),
+    )
+    other = createrepo_c.OtherXmlFile(str(Path(repodata_path, "other.xml.gz")))
+    for xml_file in (primary, filelists, other):
+        xml_file.set_num_of_pkgs(packages)
+    for number in range(packages):
+        package = createrepo_c.Package()
+        package.name = get_package_name(number)
+        package.epoch = "0"
+        package.version = "1.0"
+        package.release = RELEASE
+        package.arch = ARCH
+        package.pkgId = f"{number:064x}"
+        package.checksum_type = "sha256"
+        package.location_href = f"Packages/{package.name}.rpm"
+        package.summary = f"Synthetic package {number}"
+        package.files = [
+            (None, f"/usr/share/{package.name}/", "README"),
+        ]
+        for xml_file in (primary, filelists, other):
+            xml_file.add_pkg(package)
+    for xml_file in (primary, filelists, other):
+        xml_file.close()
+
+
+def write_modules(repodata_path: Path, packages: int, modules: int):
+    documents = []
+    for number in range(modules):
+        artifacts = [
+            get_package_nevra(package_number)
+            for package_number in range(number, packages, modules or 1)
+        ][:10]
+        documents.append(
+            {
+                "document": "modulemd",
+                "version": 2,
+                "data": {
+                    "name": f"bench-module-{number}",
+                    "stream": "1",
+                    "version": 8000020230101000000 + number,
+                    "context": "a1b2c3d4",
+                    "arch": ARCH,
+                    "summary": f"Synthetic module {number}",
+                    "description": f"Synthetic module {number}",
+                    "license": {"module": ["MIT"]},
+                    "artifacts": {"rpms": artifacts},
+                },
+            }
+        )
+    with open(Path(repodata_path, "modules.yaml"), "w") as fd:
+        yaml.safe_dump_all(documents, fd, explicit_start=True)
+
+
+def write_updateinfo(
+    repodata_path: Path,
+    packages: int,
+    advisories: int,
+    modules: int,
+    packages_per_advisory: int,
+    missing_ratio: float,
+):
+    # seeded generator keeps the set of missing packages stable between runs
+    rnd = random.Random(advisories)
+    updateinfo = createrepo_c.UpdateInfo()
+    for number in range(advisories):
+        record = createrepo_c.UpdateRecord()
+        record.id = f"BENCH-2023:{number:05d}"
+        record.type = "security"
+        record.title = f"Synthetic advisory {number}"
+        record.issued_date = datetime.datetime(2023, 1, 1)
+        record.updated_date = datetime.datetime(2023, 1, 1)
+        collection = createrepo_c.UpdateCollection()
+        collection.shortname = f"bench-{number}"
+        collection.name = f"Synthetic collection {number}"
+        if modules and number % 10 == 0:
+            module_number = number // 10 % modules
+            module = createrepo_c.UpdateCollectionModule()
+            module.name = f"bench-module-{module_number}"
+            module.stream = "1"
+            module.version = 8000020230101000000 + module_number
+            module.context = "a1b2c3d4"
+            module.arch = ARCH
+            collection.module = module
+        for _ in range(packages_per_advisory):
+            package_number = rnd.randrange(packages)
+            package = createrepo_c.UpdateCollectionPackage()
+            package.name = get_package_name(package_number)
+            package.epoch = "0"
+            package.version = "1.0"
+            package.release = RELEASE
+            if rnd.random() < missing_ratio:
+                package.release = "2.el8"
+            package.arch = ARCH
+            package.filename = f"{package.name}.rpm"
+            collection.append(package)
+        record.append_collection(collection)
+        updateinfo.append(record)
+    with gzip.open(Path(repodata_path, "updateinfo.xml.gz"), "wt") as fd:
+        fd.write(updateinfo.xml_dump())
+
+
+def generate_repodata(
+    repo_path: Path,
+    packages: int,
+    advisories: int,
+    modules: int,
+    packages_per_advisory: int = 5,
+    missing_ratio: float = 0.1,
+) -> Path:
+    repodata_path = Path(repo_path, "repodata")
+    repodata_path.mkdir(parents=True, exist_ok=True)
+    write_packages(repodata_path, packages)
+    write_modules(repodata_path, packages, modules)
+    write_updateinfo(
+        repodata_path,
+        packages,
+        advisories,
+        modules,
+        packages_per_advisory,
+        missing_ratio,
+    )
+    repomd = createrepo_c.Repomd()
+    for data_type, file_name in (
+        ("primary", "primary.xml.gz"),
+        ("filelists", "filelists.xml.gz"),
+        ("other", "other.xml.gz"),
+        ("modules", "modules.yaml"),
+        ("updateinfo", "updateinfo.xml.gz"),
+    ):
+        record = createrepo_c.RepomdRecord(
+            data_type,
+            str(Path(repodata_path, file_name)),
+        )
+        record.fill(createrepo_c.SHA256)
+        repomd.set_record(record)
+    repomd_path = Path(repodata_path, "repomd.xml")
+    with open(repomd_path, "w") as fd:
+        fd.write(repomd.xml_dump())
+    return repomd_path
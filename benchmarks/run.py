@@ -0,0 +1,214 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+from repodata import generate_repodata
+
+from updateinfo_monitor import utils
+from updateinfo_monitor.schemas import (
+    Inventory,
+    RepodataCacheResult,
+    Repository,
+)
+
+BASELINES_PATH = Path(Path(__file__).parent, "baselines.json")
+
+
+def get_cache_result(repomd_path: Path) -> RepodataCacheResult:
+    cache_result = RepodataCacheResult(
+        repo_name="bench",
+        repo_arch="x86_64",
+        cache_dir=repomd_path.parent.parent,
+    )
+    for rec in utils.iter_repodata_records(repomd_path, repomd_path.parent):
+        cache_result.add_repomd_record(rec)
+    return cache_result
+
+
+@contextmanager
+def offline_database():
+    # the checker reads stored update records and writes them back,
+    # the database round trips are not a part of the measured hot path
+    session = mock.MagicMock()
+    session.execute.return_value.all.return_value = []
+    with mock.patch.object(
+        utils,
+        "get_session",
+    ) as get_session, mock.patch.object(utils, "save_check_batch"):
+        get_session.return_value.__enter__.return_value = session
+        yield
+
+
+def bench_parse_primary_packages(repomd_path: Path):
+    cache_result = get_cache_result(repomd_path)
+    return lambda: cache_result.parse_packages(primary_only=True)
+
+
+def bench_parse_packages(repomd_path: Path):
+    cache_result = get_cache_result(repomd_path)
+    return cache_result.parse_packages
+
+
+def bench_parse_modules(repomd_path: Path):
+    def parse():
+        cache_result.modules_path.unlink(missing_ok=True)
+        return cache_result.parse_modules()
+
+    cache_result = get_cache_result(repomd_path)
+    return parse
+
+
+def bench_parse_cached_modules(repomd_path: Path):
+    cache_result = get_cache_result(repomd_path)
+    cache_result.parse_modules()
+    return cache_result.parse_modules
+
+
+def bench_updateinfo_from_file(repomd_path: Path):
+    cache_result = get_cache_result(repomd_path)
+    updateinfo_path = cache_result.get_repomd_record("updateinfo").path
+    return lambda: utils.updateinfo_from_file(updateinfo_path)
+
+
+def bench_iter_updateinfo_records(repomd_path: Path):
+    cache_result = get_cache_result(repomd_path)
+    updateinfo_path = cache_result.get_repomd_record("updateinfo").path
+    return lambda: list(utils.iter_updateinfo_records(updateinfo_path))
+
+
+def bench_check_repo_updateinfo(repomd_path: Path):
+    def check():
+        repo = Repository(id=1, name="bench", url="http://localhost/")
+        with offline_database():
+            utils.check_repo_updateinfo(
+                repo=repo,
+                updateinfo_records=updateinfo_records,
+                inventory=inventory,
+            )
+
+    cache_result = get_cache_result(repomd_path)
+    inventory = Inventory.construct(
+        packages=cache_result.parse_packages(primary_only=True),
+        modules=cache_result.parse_modules(),
+    )
+    updateinfo_path = cache_result.get_repomd_record("updateinfo").path
+    updateinfo_records = list(utils.iter_updateinfo_records(updateinfo_path))
+    return check
+
+
+BENCHMARKS = {
+    "parse_primary_packages": bench_parse_primary_packages,
+    "parse_packages": bench_parse_packages,
+    "parse_modules": bench_parse_modules,
+    "parse_cached_modules": bench_parse_cached_modules,
+    "updateinfo_from_file": bench_updateinfo_from_file,
+    "iter_updateinfo_records": bench_iter_updateinfo_records,
+    "check_repo_updateinfo": bench_check_repo_updateinfo,
+}
+
+
+def run_benchmark(name: str, repomd_path: Path, repeat: int) -> dict:
+    func = BENCHMARKS[name](repomd_path)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        # kilobytes on Linux, peak of the whole benchmark process
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        "albs-updateinfo-monitor-benchmarks",
+        description="Benchmark repodata parsers and updateinfo checker",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--packages", type=int, default=20000)
+    parser.add_argument("--advisories", type=int, default=2000)
+    parser.add_argument("--modules", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        choices=list(BENCHMARKS),
+        help="Benchmark to run, all of them by default",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store results as the baseline for current repodata size",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown against the baseline",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    size = f"{args.packages}-{args.advisories}-{args.modules}"
+    baselines = {}
+    if BASELINES_PATH.exists():
+        baselines = json.loads(BASELINES_PATH.read_text())
+    size_baselines = baselines.get(size, {})
+    results = {}
+    regressions = []
+    # every benchmark runs in a fresh process to measure its own peak RSS
+    mp_context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as repo_path:
+        repomd_path = generate_repodata(
+            Path(repo_path),
+            packages=args.packages,
+            advisories=args.advisories,
+            modules=args.modules,
+        )
+        print(
+            f"{'benchmark':<26}{'min, s':>10}{'median, s':>12}"
+            f"{'RSS, MiB':>10}"
+        )
+        for name in args.benchmark or BENCHMARKS:
+            with mp_context.Pool(1) as pool:
+                result = pool.apply(
+                    run_benchmark,
+                    (name, repomd_path, args.repeat),
+                )
+            results[name] = result
+            line = (
+                f"{name:<26}{result['min']:>10.3f}{result['median']:>12.3f}"
+                f"{result['max_rss'] / 1024:>10.1f}"
+            )
+            baseline = size_baselines.get(name)
+            if baseline:
+                slowdown = result["min"] / baseline["min"] - 1
+                line += f"  {slowdown:+.1%} vs baseline"
+                if slowdown > args.threshold:
+                    regressions.append(name)
+            print(line)
+    if args.save_baseline:
+        baselines[size] = {**size_baselines, **results}
+        BASELINES_PATH.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"Baseline is saved to {BASELINES_PATH}")
+    if regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import func, select
+
+from updateinfo_monitor import models
+from updateinfo_monitor.config import settings
+from updateinfo_monitor.constants import API_CACHE_SIZE, API_MAX_PAGE_SIZE
+from updateinfo_monitor.database import get_session
+
+
+class ResponseCache:
+    # responses are dropped when indexing results are saved by this process
+    # and expire after API_CACHE_TTL to catch up with other processes,
+    # at most API_CACHE_SIZE least recently used responses are kept
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.responses = OrderedDict()
+
+    def get(self, key: tuple) -> tuple[str, bytes] | None:
+        with self.lock:
+            response = self.responses.get(key)
+            if not response:
+                return
+            expires_at, etag, body = response
+            if expires_at < time.monotonic():
+                del self.responses[key]
+                return
+            self.responses.move_to_end(key)
+        return etag, body
+
+    def set(self, key: tuple, etag: str, body: bytes):
+        now = time.monotonic()
+        with self.lock:
+            expired_keys = [
+                cached_key
+                for cached_key, (expires_at, _, _) in self.responses.items()
+                if expires_at < now
+            ]
+            for cached_key in expired_keys:
+                del self.responses[cached_key]
+            self.responses[key] = (now + settings.api_cache_ttl, etag, body)
+            self.responses.move_to_end(key)
+            while len(self.responses) > API_CACHE_SIZE:
+                self.responses.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.responses.clear()
+
+
+api_cache = ResponseCache()
+
+
+def get_etag(*values) -> str:
+    content = "\n".join(str(value) for value in values)
+    return f'"{hashlib.sha256(content.encode()).hexdigest()}"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def get_page(query: dict[str, list[str]]) -> tuple[int, int]:
+    page = max(int(query.get("page", ["1"])[0]), 1)
+    page_size = int(query.get("page_size", [settings.api_page_size])[0])
+    return page, min(max(page_size, 1), API_MAX_PAGE_SIZE)
+
+
+def serialize_repository(
+    repo: models.Repository,
+    failed_records: int,
+    with_error: bool = False,
+) -> dict:
+    data = {
+        "id": repo.id,
+        "name": repo.name,
+        "arch": repo.arch,
+        "distribution": repo.distribution,
+        "url": repo.url,
+        "is_old": repo.is_old,
+        "is_active": repo.is_active,
+        "check_ts": repo.check_ts,
+        "next_check_ts": repo.next_check_ts,
+        "metadata_changed_ts": repo.metadata_changed_ts,
+        "repomd_checksum": repo.repomd_checksum,
+        "check_result_checksum": repo.check_result_checksum,
+        "failed_records": failed_records,
+        "has_error": bool(repo.last_error),
+    }
+    if with_error:
+        data["last_error"] = repo.last_error
+    return data
+
+
+def get_failed_records_query():
+    return (
+        select(func.count(models.CheckResult.id))
+        .where(models.CheckResult.repository_id == models.Repository.id)
+        .scalar_subquery()
+    )
+
+
+def get_repositories(query: dict[str, list[str]]) -> tuple[str, dict]:
+    page, page_size = get_page(query)
+    with get_session() as session:
+        total = session.execute(
+            select(func.count(models.Repository.id)),
+        ).scalar()
+        repos = session.execute(
+            select(models.Repository, get_failed_records_query())
+            .order_by(models.Repository.id)
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        ).all()
+    items = [
+        serialize_repository(repo, failed_records)
+        for repo, failed_records in repos
+    ]
+    etag = get_etag(
+        page,
+        page_size,
+        total,
+        *(
+            (
+                item["id"],
+                item["repomd_checksum"],
+                item["check_result_checksum"],
+                item["check_ts"],
+            )
+            for item in items
+        ),
+    )
+    return etag, {
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "items": items,
+    }
+
+
+def get_repository(
+    query: dict[str, list[str]],
+    repository_id: str,
+) -> tuple[str, dict] | None:
+    with get_session() as session:
+        result = session.execute(
+            select(models.Repository, get_failed_records_query()).where(
+                models.Repository.id == int(repository_id),
+            )
+        ).first()
+    if not result:
+        return
+    repo, failed_records = result
+    etag = get_etag(
+        repo.id,
+        repo.repomd_checksum,
+        repo.check_result_checksum,
+        repo.check_ts,
+    )
+    return etag, serialize_repository(repo, failed_records, with_error=True)
+
+
+def get_check_results(
+    query: dict[str, list[str]],
+    repository_id: str,
+) -> tuple[str, dict] | None:
+    page, page_size = get_page(query)
+    with get_session() as session:
+        repo = session.get(models.Repository, int(repository_id))
+        if not repo:
+            return
+        total = session.execute(
+            select(func.count(models.CheckResult.id)).where(
+                models.CheckResult.repository_id == repo.id,
+            )
+        ).scalar()
+        check_results = session.execute(
+            select(models.CheckResult)
+            .where(models.CheckResult.repository_id == repo.id)
+            .order_by(models.CheckResult.record_id)
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        ).scalars()
+        items = [
+            {
+                "record_id": check_result.record_id,
+                "missing_packages": check_result.missing_packages,
+                "missing_modular_packages": (
+                    check_result.missing_modular_packages
+                ),
+                "missing_modules": check_result.missing_modules,
+            }
+            for check_result in check_results
+        ]
+    etag = get_etag(repo.id, repo.check_result_checksum, page, page_size)
+    return etag, {
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+        "items": items,
+    }
+
+
+# routes are (pattern, handler, whether the handler is paged)
+ROUTES = (
+    (re.compile(r"^/repositories/?$"), get_repositories, True),
+    (re.compile(r"^/repositories/(\d+)/?$"), get_repository, False),
+    (
+        re.compile(r"^/repositories/(\d+)/check_results/?$"),
+        get_check_results,
+        True,
+    ),
+)
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/metrics":
+            self.send_body(
+                HTTPStatus.OK,
+                generate_latest(),
+                content_type=CONTENT_TYPE_LATEST,
+            )
+            return
+        try:
+            response = self.get_response(url)
+        except ValueError:
+            self.send_error(HTTPStatus.BAD_REQUEST)
+            return
+        except Exception:
+            logging.exception("Cannot handle API request: %s", self.path)
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
+            return
+        if not response:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        etag, body = response
+        if etag_matches(etag, self.headers.get("If-None-Match", "")):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_body(HTTPStatus.OK, body, etag=etag)
+
+    def get_response(
+        self,
+        url: urllib.parse.SplitResult,
+    ) -> tuple[str, bytes] | None:
+        for pattern, route, paged in ROUTES:
+            match = pattern.match(url.path)
+            if not match:
+                continue
+            query = urllib.parse.parse_qs(url.query)
+            # responses are cached by validated parameters only,
+            # so arbitrary query strings don't add cache entries
+            cache_key = (route.__name__, *map(int, match.groups()))
+            if paged:
+                cache_key += get_page(query)
+            cached_response = api_cache.get(cache_key)
+            if cached_response:
+                return cached_response
+            result = route(query, *match.groups())
+            if not result:
+                return
+            etag, data = result
+            body = json.dumps(data, default=str).encode()
+            api_cache.set(cache_key, etag, body)
+            return etag, body
+
+    def send_body(
+        self,
+        status: HTTPStatus,
+        body: bytes,
+        content_type: str = "application/json",
+        etag: str | None = None,
+    ):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("API request: %s", format % args)
+
+
+def start_api_server():
+    server = ThreadingHTTPServer(("", settings.api_port), ApiRequestHandler)
+    threading.Thread(
+        target=server.serve_forever,
+        name="api",
+        daemon=True,
+    ).start()
+    logging.info("Serving API and metrics on %d port", settings.api_port)
@@ -1,11 +1,33 @@
 import argparse
+import logging
+import sys
 from pathlib import Path
 
-from updateinfo_monitor.monitor import start_monitoring_loop
-from updateinfo_monitor.utils import (
-    configure_logger,
-    load_repositories_from_file,
-)
+# heavy parsing, Slack and DB libraries are imported by commands,
+# so short-lived commands like status start quickly
+EXIT_OK = 0
+EXIT_FAILED_RECORDS = 1
+EXIT_INDEX_ERRORS = 2
+EXIT_NO_REPOSITORIES = 3
+
+
+def add_filter_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--distribution",
+        help="Distribution name from the repositories file",
+        required=False,
+    )
+    parser.add_argument(
+        "--arch",
+        help="Repository architecture, can be specified multiple times",
+        action="append",
+        required=False,
+    )
+    parser.add_argument(
+        "--name",
+        help="Repository name glob pattern, e.g. almalinux-9-*",
+        required=False,
+    )
 
 
 def parse_args():
@@ -27,17 +49,200 @@ def parse_args():
         required=False,
         type=Path,
     )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser(
+        "monitor",
+        help="Start monitoring loop",
+    )
+    load_parser = subparsers.add_parser(
+        "load",
+        help="Load repositories from .yml file in DB",
+    )
+    load_parser.add_argument(
+        "file",
+        help="Path to .yml file with repositories",
+        type=Path,
+    )
+    load_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show changes of repositories without applying them",
+        required=False,
+    )
+    check_parser = subparsers.add_parser(
+        "check",
+        help="Check matching repositories once and exit with their status",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    add_filter_arguments(check_parser)
+    check_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Check all advisories even if repodata is not changed",
+        required=False,
+    )
+    status_parser = subparsers.add_parser(
+        "status",
+        help="Show check status of matching repositories",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    add_filter_arguments(status_parser)
+    status_parser.add_argument(
+        "--details",
+        action="store_true",
+        help="Show missing items of failed records",
+        required=False,
+    )
     return parser.parse_args()
 
 
+def glob_to_like(pattern: str) -> str:
+    for char in ("\\", "%", "_"):
+        pattern = pattern.replace(char, f"\\{char}")
+    return pattern.replace("*", "%").replace("?", "_")
+
+
+def get_repo_conditions(args: argparse.Namespace) -> list:
+    from updateinfo_monitor import models
+
+    conditions = [
+        models.Repository.is_old.is_(False),
+        models.Repository.is_active.is_(True),
+    ]
+    if args.distribution:
+        conditions.append(
+            models.Repository.distribution == args.distribution,
+        )
+    if args.arch:
+        conditions.append(models.Repository.arch.in_(args.arch))
+    if args.name:
+        conditions.append(
+            models.Repository.name.like(glob_to_like(args.name)),
+        )
+    return conditions
+
+
+def show_status(conditions: list, details: bool = False) -> int:
+    from sqlalchemy import func, select
+
+    from updateinfo_monitor import models
+    from updateinfo_monitor.database import get_session
+
+    failed_records = (
+        select(func.count(models.CheckResult.id))
+        .where(models.CheckResult.repository_id == models.Repository.id)
+        .scalar_subquery()
+    )
+    with get_session() as session:
+        repos = session.execute(
+            select(models.Repository, failed_records)
+            .where(*conditions)
+            .order_by(models.Repository.name, models.Repository.arch)
+        ).all()
+        if not repos:
+            logging.error("No repositories match the given filters")
+            return EXIT_NO_REPOSITORIES
+        exit_code = EXIT_OK
+        print(f"{'REPOSITORY':<50} {'CHECKED AT':<19} {'FAILED':>6} ERROR")
+        for repo, repo_failed_records in repos:
+            check_ts = "never"
+            if repo.check_ts:
+                check_ts = repo.check_ts.strftime("%Y-%m-%d %H:%M:%S")
+            has_error = "yes" if repo.last_error else "no"
+            print(
+                f"{repo.full_name:<50} {check_ts:<19} "
+                f"{repo_failed_records:>6} {has_error}"
+            )
+            if repo.last_error:
+                exit_code = EXIT_INDEX_ERRORS
+            elif repo_failed_records and exit_code == EXIT_OK:
+                exit_code = EXIT_FAILED_RECORDS
+            if not details or not repo_failed_records:
+                continue
+            check_results = session.execute(
+                select(models.CheckResult)
+                .where(models.CheckResult.repository_id == repo.id)
+                .order_by(models.CheckResult.record_id)
+            ).scalars()
+            for check_result in check_results:
+                print(f"  {check_result.record_id}")
+                for title, missing_items in (
+                    ("missing packages", check_result.missing_packages),
+                    (
+                        "missing modular packages",
+                        check_result.missing_modular_packages,
+                    ),
+                    ("missing modules", check_result.missing_modules),
+                ):
+                    if missing_items:
+                        print(f"    {title}: {', '.join(missing_items)}")
+    return exit_code
+
+
+def check_repositories(conditions: list, force: bool = False) -> int:
+    from traceback import format_exc
+
+    from updateinfo_monitor import models
+    from updateinfo_monitor.monitor import get_worker_id
+    from updateinfo_monitor.utils import (
+        claim_repo,
+        index_repo,
+        repo_lease_heartbeat,
+        update_repo_values,
+    )
+
+    worker_id = get_worker_id(0)
+    checked_repo_ids = []
+    while True:
+        repo = claim_repo(
+            worker_id,
+            *conditions,
+            models.Repository.id.not_in(checked_repo_ids),
+        )
+        if not repo:
+            break
+        checked_repo_ids.append(repo.id)
+        if force:
+            repo.repomd_checksum = None
+            repo.repomd_etag = None
+            repo.repomd_last_modified = None
+        try:
+            with repo_lease_heartbeat(repo, worker_id):
+                index_repo(repo, force=force)
+            repo.last_error = None
+        except Exception:
+            logging.exception("Cannot index repo: %s", repo.full_name)
+            repo.last_error = format_exc()
+        finally:
+            update_repo_values(repo, worker_id)
+    logging.info("Checked %d repositories", len(checked_repo_ids))
+    return show_status(conditions)
+
+
 def main():
     args = parse_args()
+    if args.command == "status":
+        return show_status(get_repo_conditions(args), details=args.details)
+
+    from updateinfo_monitor.utils import (
+        configure_logger,
+        load_repositories_from_file,
+    )
+
     configure_logger()
-    if args.file:
-        load_repositories_from_file(args.file)
-        return
+    if args.command == "check":
+        return check_repositories(get_repo_conditions(args), args.force)
+    if args.command == "load" or args.file:
+        dry_run = getattr(args, "dry_run", False)
+        diff = load_repositories_from_file(args.file, dry_run=dry_run)
+        if dry_run:
+            print("\n".join(diff.report()) or "No changes")
+        return EXIT_OK
+
+    from updateinfo_monitor.monitor import start_monitoring_loop
+
     start_monitoring_loop()
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
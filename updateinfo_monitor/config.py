@@ -3,7 +3,31 @@ from typing import Literal
 
 from pydantic import BaseSettings, PostgresDsn
 
-from updateinfo_monitor.constants import INDEX_INTERVAL, LOOP_SLEEP_TIME
+from updateinfo_monitor.constants import (
+    API_CACHE_TTL,
+    API_PAGE_SIZE,
+    API_PORT,
+    BLOB_TTL,
+    DB_BATCH_SIZE,
+    DOWNLOAD_WORKERS,
+    HTTP_BACKOFF_FACTOR,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_SIZE,
+    HTTP_READ_TIMEOUT,
+    HTTP_RETRIES,
+    INDEX_INTERVAL,
+    INDEX_INTERVAL_FACTOR,
+    LEASE_TIMEOUT,
+    LOOP_SLEEP_TIME,
+    MAX_INDEX_INTERVAL,
+    NOTIFICATION_INTERVAL,
+    PARSE_WORKERS,
+    REPODATA_TYPES,
+    SLACK_RETRIES,
+    SWEEP_INTERVAL,
+    SWEEP_WORKERS,
+    WORKERS,
+)
 
 
 class Settings(BaseSettings):
@@ -12,12 +36,38 @@ class Settings(BaseSettings):
     )
 
     index_interval: int = INDEX_INTERVAL
+    max_index_interval: int = MAX_INDEX_INTERVAL
+    index_interval_factor: float = INDEX_INTERVAL_FACTOR
     loop_sleep_time: int = LOOP_SLEEP_TIME
+    workers: int = WORKERS
+    lease_timeout: int = LEASE_TIMEOUT
+    sweep_enabled: bool = True
+    sweep_interval: int = SWEEP_INTERVAL
+    sweep_workers: int = SWEEP_WORKERS
     repodata_cache_dir: Path = Path("/srv/repodata_cache_dir/")
+    repodata_types: list[str] = list(REPODATA_TYPES)
+    blob_ttl: int = BLOB_TTL
+    zchunk_enabled: bool = False
+    download_workers: int = DOWNLOAD_WORKERS
+    parse_workers: int = PARSE_WORKERS
+    http_pool_size: int = HTTP_POOL_SIZE
+    http_connect_timeout: int = HTTP_CONNECT_TIMEOUT
+    http_read_timeout: int = HTTP_READ_TIMEOUT
+    http_retries: int = HTTP_RETRIES
+    http_backoff_factor: float = HTTP_BACKOFF_FACTOR
+    updateinfo_streaming: bool = True
+    check_backend: Literal["memory", "sql"] = "memory"
+    db_batch_size: int = DB_BATCH_SIZE
+    api_enabled: bool = True
+    api_port: int = API_PORT
+    api_page_size: int = API_PAGE_SIZE
+    api_cache_ttl: int = API_CACHE_TTL
     logging_level: Literal["INFO", "DEBUG", "WARNING", "ERROR"] = "INFO"
     slack_notifications_enabled: bool = False
     slack_bot_token: str = ""
     slack_channel_id: str = ""
+    slack_retries: int = SLACK_RETRIES
+    notification_interval: int = NOTIFICATION_INTERVAL
 
 
 settings = Settings()
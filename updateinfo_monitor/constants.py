@@ -1,2 +1,46 @@
 INDEX_INTERVAL = 10  # time in minutes
+MAX_INDEX_INTERVAL = 360  # time in minutes
+INDEX_INTERVAL_FACTOR = 2  # interval growth for unchanged repositories
 LOOP_SLEEP_TIME = 30  # time in seconds
+WORKERS = 1  # number of indexing workers per process
+LEASE_TIMEOUT = 300  # time in seconds
+REPODATA_TYPES = (
+    "updateinfo",
+    "primary",
+    "modules",
+)  # repomd.xml record types to download
+ZCHUNK_REPODATA_TYPES = (
+    "primary",
+    "filelists",
+    "other",
+    "updateinfo",
+)  # record types fetched as *_zck delta downloads if zchunk is enabled
+ZCHUNK_TIMEOUT_FACTOR = 10  # zckdl run time limit in HTTP read timeouts
+DOWNLOAD_WORKERS = 4  # number of parallel downloads per repository
+PARSE_WORKERS = 4  # number of repodata parse processes per repository
+HTTP_POOL_SIZE = 10  # number of keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = 10  # time in seconds
+HTTP_READ_TIMEOUT = 60  # time in seconds
+HTTP_RETRIES = 5
+HTTP_BACKOFF_FACTOR = 1.0  # time in seconds
+HTTP_RETRY_STATUSES = (
+    429,
+    500,
+    502,
+    503,
+    504,
+)  # HTTP response statuses of retried requests
+DB_BATCH_SIZE = 500  # number of rows written to DB at once
+COPY_BUFFER_SIZE = 16777216  # COPY rows spilled to disk above this size
+SWEEP_INTERVAL = 30  # time in seconds
+SWEEP_WORKERS = 16  # number of parallel repomd.xml requests
+SWEEP_LOCK_ID = 7308295  # PostgreSQL advisory lock key of the sweep phase
+BLOB_TTL = 24  # time in hours to keep unreferenced repodata blobs
+API_PORT = 8000  # port of the HTTP API and Prometheus metrics
+API_PAGE_SIZE = 50  # default number of items in API responses
+API_MAX_PAGE_SIZE = 500
+API_CACHE_TTL = 60  # time in seconds to keep cached API responses
+API_CACHE_SIZE = 1024  # number of cached API responses
+NOTIFICATION_INTERVAL = 300  # time in seconds between Slack digests
+SLACK_RETRIES = 5  # retries of rate limited Slack API calls
+SLACK_MESSAGE_LENGTH = 3000  # longer digests are uploaded as a file
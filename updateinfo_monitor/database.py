@@ -7,6 +7,7 @@ from updateinfo_monitor.config import settings
 
 engine = create_engine(
     settings.pg_dsn,
+    pool_size=max(5, settings.workers * 2),
 )
 Session = sessionmaker(engine)
 
@@ -0,0 +1,30 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+INDEX_PHASE_DURATION = Histogram(
+    "updateinfo_monitor_index_phase_duration_seconds",
+    "Time spent in each phase of repository indexing",
+    ["phase"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+DOWNLOADED_BYTES = Counter(
+    "updateinfo_monitor_downloaded_bytes",
+    "Bytes of repository metadata downloaded",
+)
+SCHEDULER_LAG = Gauge(
+    "updateinfo_monitor_scheduler_lag_seconds",
+    "How long the most overdue repository waits for indexing",
+)
+REPOSITORY_LAST_SUCCESS = Gauge(
+    "updateinfo_monitor_repository_last_success_timestamp_seconds",
+    "Time of the last successful repository indexing",
+    ["repository"],
+)
+REPOSITORY_ERRORS = Counter(
+    "updateinfo_monitor_repository_errors",
+    "Failed repository indexing attempts",
+    ["repository"],
+)
+
+
+def time_phase(phase: str):
+    return INDEX_PHASE_DURATION.labels(phase).time()
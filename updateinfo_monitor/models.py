@@ -5,11 +5,15 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
+    Integer,
+    MetaData,
     String,
     Table,
     Text,
+    UniqueConstraint,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -41,22 +45,52 @@ OldRepositories = Table(
 
 class Repository(Base):
     __tablename__ = "repositories"
+    __table_args__ = (
+        Index(
+            "repositories_is_old_next_check_ts_idx",
+            "is_old",
+            "next_check_ts",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(Text)
     arch: Mapped[str] = mapped_column(String(10))
+    distribution: Mapped[str] = mapped_column(Text, nullable=True)
     debuginfo: Mapped[bool] = mapped_column(Boolean, default=False)
     url: Mapped[str] = mapped_column(Text)
+    repodata_types: Mapped[list[str]] = mapped_column(
+        ARRAY(Text),
+        nullable=True,
+    )
     repomd_etag: Mapped[str] = mapped_column(Text, nullable=True)
+    repomd_last_modified: Mapped[str] = mapped_column(Text, nullable=True)
     repomd_checksum: Mapped[str] = mapped_column(Text, nullable=True)
     check_ts: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    next_check_ts: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    check_interval: Mapped[int] = mapped_column(Integer, nullable=True)
+    metadata_changed_ts: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=True,
+    )
+    priority: Mapped[int] = mapped_column(Integer, default=0)
+    needs_index: Mapped[bool] = mapped_column(Boolean, default=False)
     last_error: Mapped[str] = mapped_column(Text, nullable=True)
-    check_result: Mapped[dict] = mapped_column(JSONB, nullable=True)
     check_result_checksum: Mapped[str] = mapped_column(Text, nullable=True)
+    packages_checksum: Mapped[str] = mapped_column(Text, nullable=True)
     is_old: Mapped[bool] = mapped_column(Boolean, default=False)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    lease_owner: Mapped[str] = mapped_column(Text, nullable=True)
+    lease_expires_at: Mapped[datetime] = mapped_column(
+        DateTime,
+        nullable=True,
+    )
     updateinfo: Mapped[list["UpdateRecord"]] = relationship(
         back_populates="repository",
     )
+    check_results: Mapped[list["CheckResult"]] = relationship(
+        back_populates="repository",
+    )
     old_repositories: Mapped[list["Repository"]] = relationship(
         "Repository",
         secondary=OldRepositories,
@@ -71,11 +105,76 @@ class Repository(Base):
 
 class UpdateRecord(Base):
     __tablename__ = "update_records"
+    __table_args__ = (
+        UniqueConstraint(
+            "repository_id",
+            "record_id",
+            name="update_records_repository_id_record_id_key",
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     record_id: Mapped[str] = mapped_column(Text)
-    updated_date: Mapped[datetime] = mapped_column(DateTime)
+    updated_date: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     repository_id: Mapped[int] = mapped_column(ForeignKey("repositories.id"))
     repository: Mapped["Repository"] = relationship(
         back_populates="updateinfo",
     )
+
+
+class CheckResult(Base):
+    __tablename__ = "check_results"
+    __table_args__ = (
+        UniqueConstraint(
+            "repository_id",
+            "record_id",
+            name="check_results_repository_id_record_id_key",
+        ),
+        Index(
+            "check_results_missing_packages_idx",
+            "missing_packages",
+            postgresql_using="gin",
+        ),
+        Index(
+            "check_results_missing_modular_packages_idx",
+            "missing_modular_packages",
+            postgresql_using="gin",
+        ),
+        Index(
+            "check_results_missing_modules_idx",
+            "missing_modules",
+            postgresql_using="gin",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    repository_id: Mapped[int] = mapped_column(ForeignKey("repositories.id"))
+    record_id: Mapped[str] = mapped_column(Text)
+    missing_packages: Mapped[list[str]] = mapped_column(ARRAY(Text))
+    missing_modular_packages: Mapped[list[str]] = mapped_column(ARRAY(Text))
+    missing_modules: Mapped[list[str]] = mapped_column(ARRAY(Text))
+    repository: Mapped["Repository"] = relationship(
+        back_populates="check_results",
+    )
+
+
+class RepositoryPackage(Base):
+    __tablename__ = "repository_packages"
+
+    repository_id: Mapped[int] = mapped_column(
+        ForeignKey("repositories.id"),
+        primary_key=True,
+    )
+    nevra: Mapped[str] = mapped_column(Text, primary_key=True)
+
+
+# staging table of the SQL check backend, it lives in a check transaction
+UpdateRecordPackages = Table(
+    "update_record_packages",
+    MetaData(),
+    Column("record_id", Text),
+    Column("nevra", Text),
+    Column("position", Integer),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
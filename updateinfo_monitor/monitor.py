@@ -1,36 +1,160 @@
 import logging
+import os
+import queue
+import socket
+import threading
 import time
 from traceback import format_exc
 
+from updateinfo_monitor.api import start_api_server
 from updateinfo_monitor.config import settings
+from updateinfo_monitor.metrics import (
+    REPOSITORY_ERRORS,
+    REPOSITORY_LAST_SUCCESS,
+)
+from updateinfo_monitor.schemas import CheckResultDelta
 from updateinfo_monitor.utils import (
+    cleanup_blob_store,
     get_repo_to_index,
     index_repo,
     init_slack_client,
+    repo_lease_heartbeat,
     send_notification,
+    sweep_repositories,
     update_repo_values,
+    update_scheduler_lag,
 )
 
 
-def start_monitoring_loop():
-    slack_client = init_slack_client()
+notification_queue = queue.Queue()
+
+
+def enqueue_notification(
+    repo_name: str,
+    check_result_delta: CheckResultDelta,
+):
+    if not check_result_delta or not settings.slack_notifications_enabled:
+        return
+    notification_queue.put((repo_name, check_result_delta))
+
+
+def collect_notifications() -> dict[str, CheckResultDelta]:
+    deltas = {}
     while True:
-        repo = get_repo_to_index()
-        if not repo:
-            logging.info(
-                "All repositories are up to date, sleeping for %d seconds",
+        try:
+            repo_name, check_result_delta = notification_queue.get_nowait()
+        except queue.Empty:
+            return deltas
+        deltas.setdefault(repo_name, CheckResultDelta()).update(
+            check_result_delta,
+        )
+
+
+def get_worker_id(worker_number: int) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{worker_number}"
+
+
+def index_next_repo(worker_id: str):
+    update_scheduler_lag()
+    repo = get_repo_to_index(worker_id)
+    if not repo:
+        logging.info(
+            "All repositories are up to date, sleeping for %d seconds",
+            settings.loop_sleep_time,
+        )
+        cleanup_blob_store()
+        time.sleep(settings.loop_sleep_time)
+        return
+    try:
+        with repo_lease_heartbeat(repo, worker_id):
+            index_repo(repo)
+        repo.last_error = None
+        REPOSITORY_LAST_SUCCESS.labels(
+            repo.full_name,
+        ).set_to_current_time()
+    except Exception:
+        logging.exception("Cannot index repo: %s", repo.full_name)
+        repo.last_error = format_exc()
+        REPOSITORY_ERRORS.labels(repo.full_name).inc()
+    finally:
+        enqueue_notification(repo.full_name, repo.check_result_delta)
+        update_repo_values(repo, worker_id)
+
+
+def start_worker_loop(worker_id: str):
+    while True:
+        try:
+            index_next_repo(worker_id)
+        except Exception:
+            # worker survives database and filesystem errors
+            logging.exception(
+                "Worker %s failed, retrying in %d seconds",
+                worker_id,
                 settings.loop_sleep_time,
             )
             time.sleep(settings.loop_sleep_time)
+
+
+def start_sweep_loop():
+    while True:
+        try:
+            sweep_repositories()
+        except Exception:
+            logging.exception("Cannot sweep repositories:")
+        time.sleep(settings.sweep_interval)
+
+
+def start_notification_loop():
+    slack_client = init_slack_client()
+    # not sent deltas are kept here, newer deltas are merged on top of them
+    deltas = {}
+    while True:
+        time.sleep(settings.notification_interval)
+        for repo_name, check_result_delta in collect_notifications().items():
+            deltas.setdefault(repo_name, CheckResultDelta()).update(
+                check_result_delta,
+            )
+        if not deltas:
             continue
         try:
-            index_repo(repo)
+            send_notification(slack_client, deltas)
         except Exception:
-            logging.exception("Cannot index repo: %s", repo.full_name)
-            repo.last_error = format_exc()
-        finally:
-            send_notification(repo, slack_client)
-            update_repo_values(repo)
+            logging.exception(
+                "Cannot post message to slack channel: %s",
+                settings.slack_channel_id,
+            )
+            continue
+        deltas = {}
+
+
+def start_monitoring_loop():
+    if settings.api_enabled:
+        start_api_server()
+    if settings.sweep_enabled:
+        threading.Thread(
+            target=start_sweep_loop,
+            name="sweep",
+            daemon=True,
+        ).start()
+    if settings.slack_notifications_enabled:
+        threading.Thread(
+            target=start_notification_loop,
+            name="notifications",
+            daemon=True,
+        ).start()
+    workers = [
+        threading.Thread(
+            target=start_worker_loop,
+            args=(get_worker_id(worker_number),),
+            name=f"worker-{worker_number}",
+        )
+        for worker_number in range(settings.workers)
+    ]
+    logging.info("Starting %d indexing workers", len(workers))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
 
 
 if __name__ == "__main__":
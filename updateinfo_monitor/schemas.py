@@ -1,14 +1,46 @@
+import json
 import logging
+import os
 from datetime import datetime
 from pathlib import Path
+from typing import NamedTuple
 
 import createrepo_c
 import gi
+import requests
 from pydantic import AnyHttpUrl, BaseModel, Field
 
 gi.require_version("Modulemd", "2.0")
 from gi.repository import Modulemd
 
+# NEVRA strings of all packages in a repository
+PackageInventory = set[str]
+# module NVSCA mapped to NEVRA strings of its RPM artifacts
+ModuleInventory = dict[str, frozenset[str]]
+
+
+class CheckResultDelta(BaseModel):
+    # IDs of records which started or stopped failing the check
+    broken: set[str] = Field(default_factory=set)
+    fixed: set[str] = Field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return bool(self.broken or self.fixed)
+
+    def add_broken(self, record_id: str):
+        self.fixed.discard(record_id)
+        self.broken.add(record_id)
+
+    def add_fixed(self, record_id: str):
+        self.broken.discard(record_id)
+        self.fixed.add(record_id)
+
+    def update(self, other: "CheckResultDelta"):
+        for record_id in other.broken:
+            self.add_broken(record_id)
+        for record_id in other.fixed:
+            self.add_fixed(record_id)
+
 
 class Repository(BaseModel):
     id: int | None = None
@@ -17,12 +49,19 @@ class Repository(BaseModel):
     url: AnyHttpUrl
     exclude_arch: list[str] = Field(default_factory=list)
     debuginfo: bool = False
+    repodata_types: list[str] | None = None
     repomd_etag: str | None = None
+    repomd_last_modified: str | None = None
     repomd_checksum: str | None = None
     check_ts: datetime | None = None
+    check_interval: int | None = None
+    metadata_changed_ts: datetime | None = None
+    priority: int = 0
     last_error: str | None = None
-    check_result: dict | None = Field(default_factory=dict)
     check_result_checksum: str | None = None
+    check_result_delta: CheckResultDelta = Field(
+        default_factory=CheckResultDelta,
+    )
     old_repositories: list["Repository"] = Field(default_factory=list)
 
     class Config:
@@ -32,13 +71,16 @@ class Repository(BaseModel):
     def full_name(self) -> str:
         return f"{self.name}.{self.arch}"
 
-    def dict_for_create(self):
-        return {
-            "name": self.name,
-            "arch": self.arch,
-            "url": self.url,
-            "debuginfo": self.debuginfo,
-        }
+    @property
+    def repomd_validators(self) -> "HttpValidators":
+        return HttpValidators(
+            etag=self.repomd_etag or "",
+            last_modified=self.repomd_last_modified or "",
+        )
+
+    def set_repomd_validators(self, validators: "HttpValidators"):
+        self.repomd_etag = validators.etag
+        self.repomd_last_modified = validators.last_modified
 
 
 class Distribution(BaseModel):
@@ -50,6 +92,76 @@ class Distribution(BaseModel):
     old_versions: list[str]
 
 
+class RepositorySyncDiff(BaseModel):
+    # repositories are keyed by (name, arch) in all fields
+    repository_ids: dict[tuple[str, str], int] = Field(default_factory=dict)
+    inserted: dict[tuple[str, str], dict] = Field(default_factory=dict)
+    # changed column names mapped to their (old, new) values
+    updated: dict[tuple[str, str], dict[str, tuple]] = Field(
+        default_factory=dict,
+    )
+    deactivated: set[tuple[str, str]] = Field(default_factory=set)
+    # ids of rows duplicating (name, arch) of another row, they are
+    # deactivated and unlinked from their (old) repositories
+    duplicates: dict[int, tuple[str, str]] = Field(default_factory=dict)
+    # (repository, old repository) pairs of old_repositories_mapping
+    linked: set[tuple[tuple[str, str], tuple[str, str]]] = Field(
+        default_factory=set,
+    )
+    unlinked: set[tuple[tuple[str, str], tuple[str, str]]] = Field(
+        default_factory=set,
+    )
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.inserted
+            or self.updated
+            or self.deactivated
+            or self.duplicates
+            or self.linked
+            or self.unlinked
+        )
+
+    def report(self) -> list[str]:
+        lines = []
+        for name, arch in sorted(self.inserted):
+            lines.append(f"+ {name}.{arch}")
+        for (name, arch), changes in sorted(self.updated.items()):
+            lines.append(f"~ {name}.{arch}")
+            for column, (old_value, new_value) in sorted(changes.items()):
+                lines.append(f"    {column}: {old_value!r} -> {new_value!r}")
+        for name, arch in sorted(self.deactivated):
+            lines.append(f"- {name}.{arch}")
+        for repo_id, (name, arch) in sorted(self.duplicates.items()):
+            lines.append(f"- {name}.{arch} (duplicate, id={repo_id})")
+        for title, pairs in (("+", self.linked), ("-", self.unlinked)):
+            for (name, arch), (old_name, old_arch) in sorted(pairs):
+                lines.append(
+                    f"{title} {name}.{arch} -> {old_name}.{old_arch}",
+                )
+        return lines
+
+
+class HttpValidators(BaseModel):
+    etag: str = ""
+    last_modified: str = ""
+
+    @staticmethod
+    def from_response(response: requests.Response) -> "HttpValidators":
+        return HttpValidators(
+            etag=response.headers.get("ETag", ""),
+            last_modified=response.headers.get("Last-Modified", ""),
+        )
+
+    def request_headers(self) -> dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
 class RepomdRecord(BaseModel):
     data_type: str
     checksum: str
@@ -61,6 +173,7 @@ class RepomdRecord(BaseModel):
     size: int
     size_open: int
     path: Path
+    validators: HttpValidators = Field(default_factory=HttpValidators)
 
 
 class Package(BaseModel):
@@ -69,20 +182,6 @@ class Package(BaseModel):
     version: str
     release: str
     arch: str
-    location_href: str = ""
-    cr_nevra: str = ""
-
-    @staticmethod
-    def from_cr_package(cr_package: createrepo_c.Package) -> "Package":
-        return Package(
-            name=cr_package.name,
-            epoch=cr_package.epoch,
-            version=cr_package.version,
-            release=cr_package.release,
-            arch=cr_package.arch,
-            location_href=cr_package.location_href,
-            cr_nevra=cr_package.nevra(),
-        )
 
     @staticmethod
     def from_cr_updatepackage(
@@ -98,10 +197,36 @@ class Package(BaseModel):
 
     @property
     def nevra(self) -> str:
-        nevra = self.cr_nevra
-        if not nevra:
-            nevra = f"{self.name}-{self.epoch}:{self.version}-{self.release}.{self.arch}"
-        return nevra
+        return f"{self.name}-{self.epoch}:{self.version}-{self.release}.{self.arch}"
+
+
+# lightweight update records produced by the streaming updateinfo parser,
+# they mirror attributes of createrepo_c.UpdateRecord and its collections
+class UpdateRecordPackage(NamedTuple):
+    name: str
+    epoch: str | None
+    version: str
+    release: str
+    arch: str
+
+
+class UpdateRecordModule(NamedTuple):
+    name: str
+    stream: str
+    version: int
+    context: str
+    arch: str
+
+
+class UpdateRecordCollection(NamedTuple):
+    module: UpdateRecordModule | None
+    packages: list[UpdateRecordPackage]
+
+
+class UpdateRecord(NamedTuple):
+    id: str
+    updated_date: datetime | None
+    collections: list[UpdateRecordCollection]
 
 
 class Module(BaseModel):
@@ -155,20 +280,96 @@ class RepodataCacheResult(BaseModel):
     changed: bool = False
     repomd_checksum: str = ""
     repomd_records: dict = Field(default_factory=dict)
-    repomd_etag: str = ""
+    repomd_validators: HttpValidators = Field(default_factory=HttpValidators)
 
     def add_repomd_record(self, record: RepomdRecord):
         self.repomd_records[record.data_type] = record
 
     def get_repomd_record(self, data_type: str) -> RepomdRecord | None:
-        return self.repomd_records.get(data_type)
+        # zchunk records are downloaded instead of the plain ones
+        return self.repomd_records.get(
+            data_type,
+        ) or self.repomd_records.get(f"{data_type}_zck")
+
+    @property
+    def snapshot_path(self) -> Path:
+        return Path(self.cache_dir, "snapshot.json")
+
+    @property
+    def inventory_path(self) -> Path:
+        return Path(self.cache_dir, "inventory.json")
+
+    @property
+    def validators_path(self) -> Path:
+        return Path(self.cache_dir, "validators.json")
+
+    @property
+    def modules_path(self) -> Path:
+        return Path(self.cache_dir, "modules.json")
+
+    def save_validators(self):
+        previous_validators = {}
+        if self.validators_path.exists():
+            with open(self.validators_path, "r") as fd:
+                previous_validators = json.load(fd)
+        validators = {"repodata/repomd.xml": self.repomd_validators.dict()}
+        for rec in self.repomd_records.values():
+            if rec.validators.etag or rec.validators.last_modified:
+                validators[rec.location_href] = rec.validators.dict()
+            elif rec.location_href in previous_validators:
+                validators[rec.location_href] = previous_validators[
+                    rec.location_href
+                ]
+        tmp_path = self.validators_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as fd:
+            json.dump(validators, fd)
+        os.replace(tmp_path, self.validators_path)
+
+    def load_snapshot(self) -> "Inventory | None":
+        if not self.repomd_checksum:
+            return
+        snapshot = Inventory.load(self.snapshot_path)
+        if not snapshot or snapshot.checksum != self.repomd_checksum:
+            return
+        return snapshot
+
+    def save_snapshot(self, inventory: "Inventory"):
+        if not self.repomd_checksum:
+            return
+        inventory.checksum = self.repomd_checksum
+        inventory.save(self.snapshot_path)
+
+    def parse_primary_packages(self) -> PackageInventory:
+        def pkgcb(cr_pkg: createrepo_c.Package) -> bool:
+            packages.add(cr_pkg.nevra())
+            return True
 
-    def parse_packages(self) -> dict[str, Package]:
         def warningcb(warning_type, message):
             logging.debug("PARSER WARNING: %s", message)
             return True
 
-        packages = {}
+        packages = set()
+        primary_record = self.get_repomd_record("primary")
+        if not primary_record:
+            raise ValueError(
+                "Cannot parse packages, primary repomd record is missing",
+            )
+        createrepo_c.xml_parse_primary(
+            str(primary_record.path),
+            pkgcb=pkgcb,
+            warningcb=warningcb,
+            do_files=False,
+        )
+        return packages
+
+    def parse_packages(self, primary_only: bool = False) -> PackageInventory:
+        def warningcb(warning_type, message):
+            logging.debug("PARSER WARNING: %s", message)
+            return True
+
+        if primary_only:
+            return self.parse_primary_packages()
+        packages = set()
         primary_record = self.get_repomd_record("primary")
         filelists_record = self.get_repomd_record("filelists")
         other_record = self.get_repomd_record("other")
@@ -183,16 +384,52 @@ class RepodataCacheResult(BaseModel):
             warningcb=warningcb,
         )
         for cr_pkg in package_iterator:
-            package = Package.from_cr_package(cr_pkg)
-            packages[package.nevra] = package
+            packages.add(cr_pkg.nevra())
             del cr_pkg
         return packages
 
-    def parse_modules(self) -> dict[str, Module]:
+    def load_modules(
+        self,
+        modules_record: RepomdRecord,
+    ) -> ModuleInventory | None:
+        if not self.modules_path.exists():
+            return
+        with open(self.modules_path, "r") as fd:
+            data = json.load(fd)
+        if data["checksum"] != modules_record.checksum:
+            return
+        return {
+            nvsca: frozenset(artifacts)
+            for nvsca, artifacts in data["modules"].items()
+        }
+
+    def save_modules(
+        self,
+        modules_record: RepomdRecord,
+        modules: ModuleInventory,
+    ):
+        data = {
+            "checksum": modules_record.checksum,
+            "modules": {
+                nvsca: list(artifacts) for nvsca, artifacts in modules.items()
+            },
+        }
+        tmp_path = self.modules_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as fd:
+            json.dump(data, fd)
+        os.replace(tmp_path, self.modules_path)
+
+    def parse_modules(self) -> ModuleInventory:
         modules = {}
         modules_record = self.get_repomd_record("modules")
         if not modules_record:
             return modules
+        # modules.yaml with already parsed and validated checksum
+        # is not loaded by libmodulemd again
+        cached_modules = self.load_modules(modules_record)
+        if cached_modules is not None:
+            logging.debug("Loaded %s from modules cache", modules_record.path)
+            return cached_modules
         idx = Modulemd.ModuleIndex.new()
         ret, _ = idx.update_from_file(str(modules_record.path), strict=True)
         if not ret:
@@ -208,5 +445,69 @@ class RepodataCacheResult(BaseModel):
                         f"{stream_mdversion} module metadata version is not supported yet"
                     )
                 module = Module.from_libmodulemd_stream(stream)
-                modules[module.nvsca] = module
+                modules[module.nvsca] = frozenset(module.artifacts)
+        self.save_modules(modules_record, modules)
         return modules
+
+
+class InventoryDelta(BaseModel):
+    # NEVRAs of added packages and NVSCAs of added modules
+    added: set[str] = Field(default_factory=set)
+    # NEVRAs of removed packages and NVSCAs of removed or shrunk modules
+    removed: set[str] = Field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+
+class Inventory(BaseModel):
+    checksum: str = ""
+    packages: PackageInventory = Field(default_factory=set)
+    modules: ModuleInventory = Field(default_factory=dict)
+
+    def update(self, other: "Inventory"):
+        self.packages.update(other.packages)
+        self.modules.update(other.modules)
+
+    def diff(self, previous: "Inventory") -> InventoryDelta:
+        added = self.packages - previous.packages
+        removed = previous.packages - self.packages
+        for nvsca, artifacts in self.modules.items():
+            previous_artifacts = previous.modules.get(nvsca)
+            if previous_artifacts is None:
+                added.add(nvsca)
+                continue
+            added.update(artifacts - previous_artifacts)
+            if previous_artifacts - artifacts:
+                removed.add(nvsca)
+        removed.update(previous.modules.keys() - self.modules.keys())
+        return InventoryDelta.construct(added=added, removed=removed)
+
+    @staticmethod
+    def load(path: Path) -> "Inventory | None":
+        if not path.exists():
+            return
+        with open(path, "r") as fd:
+            data = json.load(fd)
+        return Inventory.construct(
+            checksum=data["checksum"],
+            packages=set(data["packages"]),
+            modules={
+                nvsca: frozenset(artifacts)
+                for nvsca, artifacts in data["modules"].items()
+            },
+        )
+
+    def save(self, path: Path):
+        data = {
+            "checksum": self.checksum,
+            "packages": list(self.packages),
+            "modules": {
+                nvsca: list(artifacts)
+                for nvsca, artifacts in self.modules.items()
+            },
+        }
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as fd:
+            json.dump(data, fd)
+        os.replace(tmp_path, path)
@@ -1,134 +1,456 @@
-import copy
+import bz2
 import datetime
+import functools
+import gzip
 import hashlib
 import logging
-import pprint
+import lzma
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
 import urllib.parse
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Iterator
+from typing import IO, Iterable, Iterator
+from xml.etree import ElementTree
 
 import createrepo_c
 import requests
 import yaml
+from requests.adapters import HTTPAdapter
 from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
-from sqlalchemy import select, update
-from sqlalchemy.orm import joinedload
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+from sqlalchemy import (
+    Table,
+    delete,
+    exists,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
+from sqlalchemy.orm import Session, noload
+from urllib3.util.retry import Retry
 
 from updateinfo_monitor import models
+from updateinfo_monitor.api import api_cache
 from updateinfo_monitor.config import settings
+from updateinfo_monitor.constants import (
+    COPY_BUFFER_SIZE,
+    HTTP_RETRY_STATUSES,
+    SLACK_MESSAGE_LENGTH,
+    SWEEP_LOCK_ID,
+    ZCHUNK_REPODATA_TYPES,
+    ZCHUNK_TIMEOUT_FACTOR,
+)
 from updateinfo_monitor.database import get_session
+from updateinfo_monitor.metrics import (
+    DOWNLOADED_BYTES,
+    INDEX_PHASE_DURATION,
+    SCHEDULER_LAG,
+    time_phase,
+)
 from updateinfo_monitor.schemas import (
+    CheckResultDelta,
     Distribution,
+    HttpValidators,
+    Inventory,
+    InventoryDelta,
     Module,
     Package,
     RepodataCacheResult,
     RepomdRecord,
     Repository,
+    RepositorySyncDiff,
+    UpdateRecord,
+    UpdateRecordCollection,
+    UpdateRecordModule,
+    UpdateRecordPackage,
 )
 
 
 def configure_logger():
     logging.basicConfig(
-        format="%(asctime)s %(levelname)-5s %(message)s",
+        format="%(asctime)s %(levelname)-5s [%(threadName)s] %(message)s",
         level=settings.logging_level,
         datefmt="%Y-%m-%d %H:%M:%S",
     )
 
 
-def get_repo_to_index() -> Repository | None:
-    delta = datetime.datetime.utcnow() - datetime.timedelta(
-        minutes=settings.index_interval,
-    )
-    query = select(models.Repository).where(
-        models.Repository.is_old.is_(False),
-        models.Repository.check_ts.is_(None)
-        | (models.Repository.check_ts < delta),
+def get_repo_to_index(worker_id: str) -> Repository | None:
+    now = datetime.datetime.utcnow()
+    # with enabled sweep phase only repositories with changed
+    # repomd.xml are indexed
+    if settings.sweep_enabled:
+        due_condition = models.Repository.needs_index.is_(True)
+    else:
+        due_condition = models.Repository.next_check_ts.is_(None) | (
+            models.Repository.next_check_ts <= now
+        )
+    return claim_repo(worker_id, due_condition)
+
+
+def claim_repo(worker_id: str, *conditions) -> Repository | None:
+    now = datetime.datetime.utcnow()
+    query = (
+        select(models.Repository)
+        .where(
+            models.Repository.is_old.is_(False),
+            models.Repository.is_active.is_(True),
+            *conditions,
+            models.Repository.lease_expires_at.is_(None)
+            | (models.Repository.lease_expires_at < now),
+        )
+        .order_by(
+            models.Repository.priority.desc(),
+            models.Repository.next_check_ts.asc().nulls_first(),
+        )
+        .limit(1)
+        .with_for_update(skip_locked=True)
     )
     with get_session() as session:
         db_repo = session.execute(query).scalars().first()
         if not db_repo:
             return
-        return Repository.from_orm(db_repo)
+        db_repo.lease_owner = worker_id
+        db_repo.lease_expires_at = now + datetime.timedelta(
+            seconds=settings.lease_timeout,
+        )
+        repo = Repository.from_orm(db_repo)
+        session.commit()
+        return repo
 
 
-def update_repo_values(repo: Repository):
+def get_check_interval(repo: Repository, metadata_changed: bool) -> int:
+    if metadata_changed or not repo.check_interval:
+        return settings.index_interval
+    return min(
+        settings.max_index_interval,
+        max(
+            settings.index_interval,
+            math.ceil(repo.check_interval * settings.index_interval_factor),
+        ),
+    )
+
+
+def renew_repo_lease(repo: Repository, worker_id: str) -> bool:
     with get_session() as session:
+        result = session.execute(
+            update(models.Repository)
+            .where(
+                models.Repository.id == repo.id,
+                models.Repository.lease_owner == worker_id,
+            )
+            .values(
+                lease_expires_at=datetime.datetime.utcnow()
+                + datetime.timedelta(seconds=settings.lease_timeout),
+            )
+        )
+        session.commit()
+        return bool(result.rowcount)
+
+
+@contextmanager
+def repo_lease_heartbeat(repo: Repository, worker_id: str):
+    stop_event = threading.Event()
+
+    def heartbeat():
+        while not stop_event.wait(settings.lease_timeout / 3):
+            try:
+                if not renew_repo_lease(repo, worker_id):
+                    logging.warning(
+                        "(%s) Lease is lost by worker %s",
+                        repo.full_name,
+                        worker_id,
+                    )
+            except Exception:
+                logging.exception(
+                    "(%s) Cannot renew lease:",
+                    repo.full_name,
+                )
+
+    thread = threading.Thread(
+        target=heartbeat,
+        name=f"{threading.current_thread().name}-heartbeat",
+        daemon=True,
+    )
+    thread.start()
+    try:
+        yield
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+def update_scheduler_lag():
+    now = datetime.datetime.utcnow()
+    with get_session() as session:
+        oldest_check_ts = session.execute(
+            select(func.min(models.Repository.next_check_ts)).where(
+                models.Repository.is_old.is_(False),
+                models.Repository.is_active.is_(True),
+            )
+        ).scalar()
+    lag = 0
+    if oldest_check_ts and oldest_check_ts < now:
+        lag = (now - oldest_check_ts).total_seconds()
+    SCHEDULER_LAG.set(lag)
+
+
+def update_repo_values(repo: Repository, worker_id: str | None = None):
+    now = datetime.datetime.utcnow()
+    check_interval = repo.check_interval or settings.index_interval
+    with time_phase("db_write"), get_session() as session:
         session.execute(
             update(models.Repository)
             .where(models.Repository.id == repo.id)
             .values(
-                check_ts=datetime.datetime.utcnow(),
+                check_ts=now,
+                next_check_ts=now
+                + datetime.timedelta(minutes=check_interval),
+                check_interval=check_interval,
+                metadata_changed_ts=repo.metadata_changed_ts,
+                needs_index=False,
                 last_error=repo.last_error,
+                repomd_etag=repo.repomd_etag,
+                repomd_last_modified=repo.repomd_last_modified,
                 repomd_checksum=repo.repomd_checksum,
-                check_result=repo.check_result,
                 check_result_checksum=repo.check_result_checksum,
             )
         )
+        # lease taken over by another worker after a timeout is kept
+        if worker_id:
+            session.execute(
+                update(models.Repository)
+                .where(
+                    models.Repository.id == repo.id,
+                    models.Repository.lease_owner == worker_id,
+                )
+                .values(lease_owner=None, lease_expires_at=None)
+            )
         session.commit()
+    api_cache.clear()
 
 
 def init_cache_dir(repo: Repository) -> Path:
     cache_dir = Path(settings.repodata_cache_dir, repo.full_name)
-    repodata_dir = Path(cache_dir, "repodata")
-    if not repodata_dir.exists():
-        repodata_dir.mkdir(parents=True)
+    get_generations_dir(cache_dir).mkdir(parents=True, exist_ok=True)
     return cache_dir
 
 
+def get_generations_dir(cache_dir: Path) -> Path:
+    return Path(cache_dir, "generations")
+
+
+@functools.cache
+def get_http_session(retries: bool = True) -> requests.Session:
+    retry = Retry(
+        total=settings.http_retries,
+        backoff_factor=settings.http_backoff_factor,
+        status_forcelist=HTTP_RETRY_STATUSES,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.http_pool_size,
+        pool_maxsize=settings.http_pool_size,
+        max_retries=retry if retries else 0,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_http_timeout() -> tuple[int, int]:
+    return settings.http_connect_timeout, settings.http_read_timeout
+
+
 def download_file_if_changed(
     src_url: str,
     dst_path: Path,
-    etag: str = "",
-) -> tuple[bool, str]:
-    headers = {"If-None-Match": etag} if etag else None
-    with requests.get(src_url, headers=headers, stream=True) as response:
+    validators: HttpValidators | None = None,
+) -> tuple[bool, HttpValidators, str]:
+    validators = validators or HttpValidators()
+    with get_http_session().get(
+        src_url,
+        headers=validators.request_headers(),
+        stream=True,
+        timeout=get_http_timeout(),
+    ) as response:
         response.raise_for_status()
         if response.status_code == requests.codes.not_modified:
-            return False, etag
-        with open(dst_path, "wb") as fd:
-            for chunk in response.iter_content(chunk_size=1024):
+            return False, validators, ""
+        hasher = hashlib.sha256()
+        partial_path = get_partial_path(dst_path)
+        with open(partial_path, "wb") as fd:
+            for chunk in response.iter_content(chunk_size=1048576):
                 fd.write(chunk)
-            return True, response.headers.get("ETag", "")
+                hasher.update(chunk)
+                DOWNLOADED_BYTES.inc(len(chunk))
+        os.replace(partial_path, dst_path)
+        return (
+            True,
+            HttpValidators.from_response(response),
+            hasher.hexdigest(),
+        )
 
 
-def get_file_checksum(
+def get_partial_path(file_path: Path) -> Path:
+    return file_path.with_name(f"{file_path.name}.part")
+
+
+def download_file(
+    src_url: str,
+    dst_path: Path,
+    checksum: str | None = None,
+    checksum_type: str = "sha256",
+    size: int | None = None,
+) -> HttpValidators:
+    # partially downloaded .part file is resumed with HTTP Range request,
+    # content is hashed while it's written, so the file isn't read again.
+    # Retries are made here only, so the session doesn't retry on its own
+    partial_path = get_partial_path(dst_path)
+    for attempt in range(settings.http_retries + 1):
+        offset = partial_path.stat().st_size if partial_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        try:
+            with get_http_session(retries=False).get(
+                src_url,
+                headers=headers,
+                stream=True,
+                timeout=get_http_timeout(),
+            ) as response:
+                if (
+                    response.status_code
+                    == requests.codes.requested_range_not_satisfiable
+                ):
+                    partial_path.unlink()
+                    continue
+                response.raise_for_status()
+                mode = "wb"
+                hasher = hashlib.new(checksum_type)
+                file_size = 0
+                if response.status_code == requests.codes.partial_content:
+                    mode = "ab"
+                    hasher = get_file_hasher(partial_path, checksum_type)
+                    file_size = offset
+                with open(partial_path, mode) as fd:
+                    for chunk in response.iter_content(chunk_size=1048576):
+                        file_size += len(chunk)
+                        if size is not None and file_size > size:
+                            break
+                        fd.write(chunk)
+                        hasher.update(chunk)
+                        DOWNLOADED_BYTES.inc(len(chunk))
+                validators = HttpValidators.from_response(response)
+            break
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.HTTPError,
+            requests.exceptions.ChunkedEncodingError,
+        ) as error:
+            if attempt == settings.http_retries or (
+                isinstance(error, requests.HTTPError)
+                and error.response.status_code not in HTTP_RETRY_STATUSES
+            ):
+                raise
+            delay = settings.http_backoff_factor * 2**attempt
+            logging.warning(
+                "Cannot download %s, retrying in %.1f seconds",
+                src_url,
+                delay,
+            )
+            time.sleep(delay)
+    else:
+        raise ValueError(f"{src_url} download failed: range is not satisfied")
+    if size is not None and file_size != size:
+        partial_path.unlink()
+        raise ValueError(f"{src_url} download failed: wrong size")
+    if checksum and hasher.hexdigest() != checksum:
+        partial_path.unlink()
+        raise ValueError(f"{src_url} download failed: wrong checksum")
+    os.replace(partial_path, dst_path)
+    return validators
+
+
+def get_file_hasher(
     file_path: Path,
     checksum_type: str = "sha256",
     buff_size: int = 1048576,
-) -> str:
+):
     hasher = hashlib.new(checksum_type)
-    with open(file_path, "rb") as fd:
+    with time_phase("checksum"), open(file_path, "rb") as fd:
         buff = fd.read(buff_size)
         while len(buff):
             hasher.update(buff)
             buff = fd.read(buff_size)
-    return hasher.hexdigest()
+    return hasher
 
 
-def get_string_checksum(string: str) -> str:
-    return hashlib.sha256(string.encode()).hexdigest()
+def get_file_checksum(
+    file_path: Path,
+    checksum_type: str = "sha256",
+    buff_size: int = 1048576,
+) -> str:
+    return get_file_hasher(file_path, checksum_type, buff_size).hexdigest()
 
 
-def cleanup_repodata_dir(repodata_path: Path):
-    if not repodata_path.exists():
-        repodata_path.mkdir()
+def swap_repodata_generation(cache_dir: Path, generation_path: Path):
+    # repodata symlink is replaced atomically, so readers see either
+    # the previous or the new generation, the previous one is kept
+    repodata_path = Path(cache_dir, "repodata")
+    previous_generation = None
+    if repodata_path.is_symlink():
+        previous_generation = Path(os.readlink(repodata_path)).name
+    elif repodata_path.exists():
+        # repodata directory of the cache layout without generations
+        shutil.rmtree(repodata_path)
+    if previous_generation == generation_path.name:
         return
-    for path in repodata_path.glob("**/*"):
-        if path.name == "repomd.xml":
+    link_path = Path(cache_dir, "repodata.link")
+    link_path.unlink(missing_ok=True)
+    link_path.symlink_to(generation_path.relative_to(cache_dir))
+    os.replace(link_path, repodata_path)
+    for path in generation_path.parent.iterdir():
+        if path.name in (generation_path.name, previous_generation):
             continue
-        if path.is_file():
-            path.unlink()
-            continue
-        path.rmdir()
+        shutil.rmtree(path)
+
+
+def get_repodata_types(repo: Repository) -> list[str]:
+    return repo.repodata_types or settings.repodata_types
 
 
 def iter_repodata_records(
     repomd_path: Path,
     repodata_path: Path,
+    data_types: list[str] | None = None,
 ) -> Iterator[RepomdRecord]:
     repomd = createrepo_c.Repomd(str(repomd_path))
+    zchunk_records = {
+        rec.type.removesuffix("_zck"): rec
+        for rec in repomd.records
+        if rec.type.endswith("_zck")
+    }
     for rec in repomd.records:
+        if data_types is not None and rec.type not in data_types:
+            continue
+        zchunk_rec = zchunk_records.get(rec.type)
+        if zchunk_rec and use_zchunk_record(rec, zchunk_rec, repodata_path):
+            rec = zchunk_rec
         yield RepomdRecord(
             **{
                 "checksum": rec.checksum,
@@ -145,6 +467,215 @@ def iter_repodata_records(
         )
 
 
+@functools.cache
+def is_zchunk_supported() -> bool:
+    if not settings.zchunk_enabled:
+        return False
+    if not createrepo_c.HAS_ZCK or not shutil.which("zckdl"):
+        logging.warning(
+            "zchunk is enabled, but createrepo_c zchunk support "
+            "or zckdl tool is missing"
+        )
+        return False
+    return True
+
+
+def use_zchunk_record(
+    rec: createrepo_c.RepomdRecord,
+    zchunk_rec: createrepo_c.RepomdRecord,
+    repodata_path: Path,
+) -> bool:
+    if rec.type not in ZCHUNK_REPODATA_TYPES:
+        return False
+    # already downloaded generation keeps the variant it was staged with
+    zchunk_path = Path(repodata_path, Path(zchunk_rec.location_href).name)
+    if zchunk_path.exists():
+        return True
+    if Path(repodata_path, Path(rec.location_href).name).exists():
+        return False
+    return is_zchunk_supported()
+
+
+def download_zchunk_file(
+    src_url: str,
+    dst_path: Path,
+    source_path: Path,
+    checksum: str,
+    checksum_type: str = "sha256",
+    size: int | None = None,
+):
+    # chunks of the source file are reused and only the changed chunks
+    # are requested, zckdl saves the file by its URL name into cwd
+    with tempfile.TemporaryDirectory(dir=dst_path.parent) as tmp_dir:
+        subprocess.run(
+            ["zckdl", "--quiet", f"--source={source_path}", src_url],
+            cwd=tmp_dir,
+            check=True,
+            capture_output=True,
+            timeout=settings.http_read_timeout * ZCHUNK_TIMEOUT_FACTOR,
+        )
+        file_name = Path(urllib.parse.urlsplit(src_url).path).name
+        tmp_path = Path(tmp_dir, file_name)
+        if size is not None and tmp_path.stat().st_size != size:
+            raise ValueError(f"{src_url} download failed: wrong size")
+        if get_file_checksum(tmp_path, checksum_type) != checksum:
+            raise ValueError(f"{src_url} download failed: wrong checksum")
+        os.replace(tmp_path, dst_path)
+
+
+def get_delta_sources(repodata_path: Path) -> dict[str, Path]:
+    repomd_path = Path(repodata_path, "repomd.xml")
+    if not is_zchunk_supported() or not repomd_path.exists():
+        return {}
+    return {
+        rec.data_type: rec.path
+        for rec in iter_repodata_records(
+            repomd_path,
+            repodata_path.resolve(),
+        )
+        if rec.data_type.endswith("_zck") and rec.path.exists()
+    }
+
+
+def get_blobs_dir() -> Path:
+    return Path(settings.repodata_cache_dir, "blobs")
+
+
+def get_blob_path(rec: RepomdRecord) -> Path:
+    return Path(get_blobs_dir(), rec.checksum_type, rec.checksum)
+
+
+def link_blob(blob_path: Path, dst_path: Path):
+    # renaming a hardlink over the same inode is a no-op leaving it behind
+    if dst_path.exists() and os.path.samefile(dst_path, blob_path):
+        return
+    link_path = dst_path.with_name(f"{dst_path.name}.link")
+    link_path.unlink(missing_ok=True)
+    os.link(blob_path, link_path)
+    os.replace(link_path, dst_path)
+
+
+def cleanup_blob_store():
+    # blob is unreferenced when no repository view has a hardlink to it,
+    # ctime of the blob is changed when its last hardlink is removed
+    expiration_ts = time.time() - settings.blob_ttl * 3600
+    for blob_path in get_blobs_dir().glob("*/*"):
+        try:
+            blob_stat = blob_path.stat()
+        except FileNotFoundError:
+            continue
+        if blob_stat.st_nlink > 1 or blob_stat.st_ctime > expiration_ts:
+            continue
+        logging.debug("Removing unreferenced blob %s", blob_path)
+        blob_path.unlink(missing_ok=True)
+
+
+def download_repodata_record(
+    repo: Repository,
+    rec: RepomdRecord,
+    delta_sources: dict[str, Path] | None = None,
+) -> RepomdRecord:
+    blob_path = get_blob_path(rec)
+    try:
+        link_blob(blob_path, rec.path)
+        logging.debug(
+            "(%s) %s is found in blob store, skipping download",
+            repo.full_name,
+            rec.location_href,
+        )
+        return rec
+    except FileNotFoundError:
+        pass
+    src_url = urllib.parse.urljoin(repo.url, rec.location_href)
+    source_path = (delta_sources or {}).get(rec.data_type)
+    with time_phase("record_download"):
+        if source_path:
+            try:
+                download_zchunk_file(
+                    src_url,
+                    rec.path,
+                    source_path,
+                    checksum=rec.checksum,
+                    checksum_type=rec.checksum_type,
+                    size=rec.size or None,
+                )
+                return link_record_blob(rec, blob_path)
+            except (
+                subprocess.CalledProcessError,
+                subprocess.TimeoutExpired,
+                FileNotFoundError,
+                ValueError,
+            ) as error:
+                logging.warning(
+                    "(%s) Cannot download %s delta, downloading it fully: %s",
+                    repo.full_name,
+                    rec.location_href,
+                    error,
+                )
+        rec.validators = download_file(
+            src_url,
+            rec.path,
+            checksum=rec.checksum,
+            checksum_type=rec.checksum_type,
+            size=rec.size or None,
+        )
+    return link_record_blob(rec, blob_path)
+
+
+def link_record_blob(rec: RepomdRecord, blob_path: Path) -> RepomdRecord:
+    blob_path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(rec.path, blob_path)
+    except FileExistsError:
+        pass
+    return rec
+
+
+def get_repomd_url(repo: Repository) -> str:
+    return urllib.parse.urljoin(repo.url, "repodata/repomd.xml")
+
+
+def stage_repodata_generation(
+    repo: Repository,
+    repomd_path: Path,
+    generation_path: Path,
+    data_types: list[str],
+    delta_sources: dict[str, Path],
+) -> list[RepomdRecord]:
+    # staging directory is renamed to the generation only after every
+    # record is verified, downloads of a failed attempt are resumed
+    staging_path = generation_path.with_name(
+        f"{generation_path.name}.staging",
+    )
+    staging_path.mkdir(exist_ok=True)
+    staged_repomd_path = Path(staging_path, "repomd.xml")
+    os.replace(repomd_path, staged_repomd_path)
+    records = iter_repodata_records(
+        staged_repomd_path,
+        staging_path,
+        data_types,
+    )
+    with ThreadPoolExecutor(
+        max_workers=settings.download_workers,
+        thread_name_prefix=f"{threading.current_thread().name}-download",
+    ) as executor:
+        records = list(
+            executor.map(
+                functools.partial(
+                    download_repodata_record,
+                    repo,
+                    delta_sources=delta_sources,
+                ),
+                records,
+            )
+        )
+    os.rename(staging_path, generation_path)
+    # downloaded records keep their HTTP validators
+    for rec in records:
+        rec.path = Path(generation_path, rec.path.name)
+    return records
+
+
 def update_repodata_cache(repo: Repository) -> RepodataCacheResult:
     cache_dir = init_cache_dir(repo)
     logging.info(
@@ -159,37 +690,66 @@ def update_repodata_cache(repo: Repository) -> RepodataCacheResult:
     )
     repodata_path = Path(cache_dir, "repodata")
     repomd_path = Path(repodata_path, "repomd.xml")
-    repomd_url = urllib.parse.urljoin(repo.url, "repodata/repomd.xml")
-    repomd_changed, cache_result.repomd_etag = download_file_if_changed(
-        repomd_url,
-        repomd_path,
-        repo.repomd_etag,
-    )
+    new_repomd_path = Path(cache_dir, "repomd.xml")
+    data_types = get_repodata_types(repo)
+    with time_phase("repomd_fetch"):
+        (
+            repomd_changed,
+            cache_result.repomd_validators,
+            cache_result.repomd_checksum,
+        ) = download_file_if_changed(
+            get_repomd_url(repo),
+            new_repomd_path,
+            repo.repomd_validators if repomd_path.exists() else None,
+        )
     if not repomd_changed:
         logging.info(
-            "%s repomd.xml ETag is not changed, skipping repodata update",
+            "%s repomd.xml is not modified, skipping repodata update",
             repo.full_name,
         )
-        for rec in iter_repodata_records(repomd_path, repodata_path):
+        cache_result.repomd_checksum = get_file_checksum(repomd_path)
+        generation_path = repodata_path.resolve()
+        for rec in iter_repodata_records(
+            Path(generation_path, "repomd.xml"),
+            generation_path,
+            data_types,
+        ):
             cache_result.add_repomd_record(rec)
         return cache_result
-    cache_result.repomd_checksum = get_file_checksum(repomd_path)
+    generation_path = Path(
+        get_generations_dir(cache_dir),
+        cache_result.repomd_checksum,
+    )
+    if generation_path.exists():
+        logging.info(
+            "(%s) Repodata generation %s is cached",
+            repo.full_name,
+            cache_result.repomd_checksum,
+        )
+        new_repomd_path.unlink()
+        records = iter_repodata_records(
+            Path(generation_path, "repomd.xml"),
+            generation_path,
+            data_types,
+        )
+    else:
+        records = stage_repodata_generation(
+            repo,
+            new_repomd_path,
+            generation_path,
+            data_types,
+            get_delta_sources(repodata_path),
+        )
+    swap_repodata_generation(cache_dir, generation_path)
+    for rec in records:
+        cache_result.add_repomd_record(rec)
     if cache_result.repomd_checksum == repo.repomd_checksum:
         logging.info(
-            "%s repomd.xml checksum is not changed, skipping repodata update",
+            "%s repomd.xml checksum is not changed, skipping repodata check",
             repo.full_name,
         )
-        for rec in iter_repodata_records(repomd_path, repodata_path):
-            cache_result.add_repomd_record(rec)
         return cache_result
-    cleanup_repodata_dir(repodata_path)
-    for rec in iter_repodata_records(repomd_path, repodata_path):
-        src_url = urllib.parse.urljoin(repo.url, rec.location_href)
-        download_file_if_changed(src_url, rec.path)
-        rec_checksum = get_file_checksum(rec.path, rec.checksum_type)
-        if rec_checksum != rec.checksum:
-            raise ValueError(f"{src_url} download failed: wrong checksum")
-        cache_result.add_repomd_record(rec)
+    cache_result.save_validators()
     cache_result.changed = True
     return cache_result
 
@@ -205,44 +765,373 @@ def updateinfo_from_file(updateinfo_path: Path) -> createrepo_c.UpdateInfo:
     return updateinfo
 
 
-def check_repo_updateinfo(
-    repo: Repository,
-    updateinfo: createrepo_c.UpdateInfo,
-    repo_packages: dict[str, Package],
-    repo_modules: dict[str, Module],
-):
+def get_affected_records(
+    repository_id: int,
+    added_items: set[str],
+) -> set[str]:
+    # records missing some of added packages or modules
+    # are looked up with GIN indexes of check results
+    if not added_items:
+        return set()
+    added_items = list(added_items)
     with get_session() as session:
-        db_records = (
+        return set(
             session.execute(
-                select(models.UpdateRecord).where(
-                    models.UpdateRecord.repository_id == repo.id
+                select(models.CheckResult.record_id).where(
+                    models.CheckResult.repository_id == repository_id,
+                    or_(
+                        models.CheckResult.missing_packages.overlap(
+                            added_items,
+                        ),
+                        models.CheckResult.missing_modular_packages.overlap(
+                            added_items,
+                        ),
+                        models.CheckResult.missing_modules.overlap(
+                            added_items,
+                        ),
+                    ),
+                )
+            ).scalars()
+        )
+
+
+def get_check_result_checksum(repository_id: int) -> str | None:
+    check_result = func.concat_ws(
+        ";",
+        models.CheckResult.record_id,
+        func.array_to_string(models.CheckResult.missing_packages, ","),
+        func.array_to_string(models.CheckResult.missing_modular_packages, ","),
+        func.array_to_string(models.CheckResult.missing_modules, ","),
+    )
+    with get_session() as session:
+        return session.execute(
+            select(
+                func.md5(
+                    func.string_agg(
+                        check_result,
+                        aggregate_order_by(
+                            literal("\n"),
+                            models.CheckResult.record_id,
+                        ),
+                    ),
+                ),
+            ).where(models.CheckResult.repository_id == repository_id),
+        ).scalar()
+
+
+def is_record_affected(
+    record: createrepo_c.UpdateRecord | UpdateRecord,
+    affected_records: set[str],
+    inventory_delta: InventoryDelta | None,
+) -> bool:
+    if inventory_delta is None or record.id in affected_records:
+        return True
+    if not inventory_delta.removed:
+        return False
+    for collection in record.collections:
+        cr_module = collection.module
+        if cr_module:
+            module = Module.from_cr_updatemodule(cr_module)
+            if module.nvsca in inventory_delta.removed:
+                return True
+        for cr_package in collection.packages:
+            package = Package.from_cr_updatepackage(cr_package)
+            if package.nevra in inventory_delta.removed:
+                return True
+    return False
+
+
+def open_zchunk_file(file_path: Path, mode: str) -> IO[bytes]:
+    # zchunk file is decompressed by createrepo_c into a temporary file,
+    # which is removed from disk right after it's opened
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        createrepo_c.decompress_file(
+            str(file_path),
+            tmp_path,
+            createrepo_c.ZCK,
+        )
+        return open(tmp_path, mode)
+    finally:
+        os.unlink(tmp_path)
+
+
+def get_metadata_opener(file_path: Path):
+    openers = {
+        createrepo_c.NO_COMPRESSION: open,
+        createrepo_c.GZ: gzip.open,
+        createrepo_c.BZ2: bz2.open,
+        createrepo_c.XZ: lzma.open,
+    }
+    if createrepo_c.HAS_ZCK:
+        openers[createrepo_c.ZCK] = open_zchunk_file
+    compression = createrepo_c.detect_compression(str(file_path))
+    return openers.get(compression)
+
+
+def open_metadata_file(file_path: Path) -> IO[bytes]:
+    opener = get_metadata_opener(file_path)
+    if not opener:
+        raise NotImplementedError(
+            f"Streaming of {file_path.name} compression is not supported",
+        )
+    return opener(file_path, "rb")
+
+
+def parse_updateinfo_date(date: str | None) -> datetime.datetime | None:
+    if not date:
+        return
+    for date_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(date, date_format)
+        except ValueError:
+            continue
+    return datetime.datetime.utcfromtimestamp(int(date))
+
+
+def iter_updateinfo_records(updateinfo_path: Path) -> Iterator[UpdateRecord]:
+    with open_metadata_file(updateinfo_path) as fd:
+        context = ElementTree.iterparse(fd, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event != "end" or elem.tag != "update":
+                continue
+            collections = []
+            for collection in elem.iterfind("pkglist/collection"):
+                module = collection.find("module")
+                if module is not None:
+                    module = UpdateRecordModule(
+                        name=module.get("name"),
+                        stream=module.get("stream"),
+                        version=int(module.get("version")),
+                        context=module.get("context"),
+                        arch=module.get("arch"),
+                    )
+                collections.append(
+                    UpdateRecordCollection(
+                        module=module,
+                        packages=[
+                            UpdateRecordPackage(
+                                name=package.get("name"),
+                                epoch=package.get("epoch"),
+                                version=package.get("version"),
+                                release=package.get("release"),
+                                arch=package.get("arch"),
+                            )
+                            for package in collection.iterfind("package")
+                        ],
+                    )
+                )
+            updated = elem.find("updated")
+            yield UpdateRecord(
+                id=elem.findtext("id"),
+                updated_date=parse_updateinfo_date(
+                    updated.get("date") if updated is not None else None,
                 ),
+                collections=collections,
+            )
+            root.clear()
+
+
+def iter_repo_updateinfo(
+    updateinfo_path: Path,
+) -> Iterable[createrepo_c.UpdateRecord | UpdateRecord]:
+    if not settings.updateinfo_streaming:
+        return updateinfo_from_file(updateinfo_path).updates
+    if not get_metadata_opener(updateinfo_path):
+        logging.warning(
+            "Cannot stream %s, loading it into memory",
+            updateinfo_path.name,
+        )
+        return updateinfo_from_file(updateinfo_path).updates
+    return iter_updateinfo_records(updateinfo_path)
+
+
+def save_check_batch(
+    repository_id: int,
+    update_records: list[dict],
+    failed_records: list[dict],
+    passed_records: list[str],
+):
+    with time_phase("db_write"), get_session() as session:
+        if update_records:
+            query = insert(models.UpdateRecord).values(update_records)
+            query = query.on_conflict_do_update(
+                constraint="update_records_repository_id_record_id_key",
+                set_={"updated_date": query.excluded.updated_date},
+            )
+            session.execute(query)
+        if failed_records:
+            query = insert(models.CheckResult).values(failed_records)
+            query = query.on_conflict_do_update(
+                constraint="check_results_repository_id_record_id_key",
+                set_={
+                    "missing_packages": query.excluded.missing_packages,
+                    "missing_modular_packages": (
+                        query.excluded.missing_modular_packages
+                    ),
+                    "missing_modules": query.excluded.missing_modules,
+                },
+            )
+            session.execute(query)
+        if passed_records:
+            session.execute(
+                delete(models.CheckResult).where(
+                    models.CheckResult.repository_id == repository_id,
+                    models.CheckResult.record_id.in_(passed_records),
+                )
             )
-            .scalars()
-            .all()
-        )
-        db_records = {rec.record_id: rec for rec in db_records}
-    repo_check_results = {}
-    if repo.check_result:
-        repo_check_results = copy.deepcopy(repo.check_result)
-    records_to_add = []
-    for record in updateinfo.updates:
-        db_record = db_records.get(record.id)
-        if db_record and db_record.updated_date == record.updated_date:
+        session.commit()
+
+
+class CheckResultWriter:
+    # check results are compared with the stored ones and only changes are
+    # written in batches, results and delta of flushed batches are kept
+    # even if the check fails halfway
+    def __init__(self, repo: Repository):
+        self.repo = repo
+        with get_session() as session:
+            self.db_records = dict(
+                session.execute(
+                    select(
+                        models.UpdateRecord.record_id,
+                        models.UpdateRecord.updated_date,
+                    ).where(models.UpdateRecord.repository_id == repo.id),
+                ).all()
+            )
+            self.db_results = {
+                record_id: missing_items
+                for record_id, *missing_items in session.execute(
+                    select(
+                        models.CheckResult.record_id,
+                        models.CheckResult.missing_packages,
+                        models.CheckResult.missing_modular_packages,
+                        models.CheckResult.missing_modules,
+                    ).where(models.CheckResult.repository_id == repo.id),
+                )
+            }
+        repo.check_result_delta = CheckResultDelta()
+        self.checked_records = set()
+        self.failed_count = 0
+        self.update_records = []
+        self.failed_records = []
+        self.passed_records = []
+
+    def add(
+        self,
+        record_id: str,
+        updated_date: datetime.datetime | None,
+        missing_packages: list[str],
+        missing_modular_packages: list[str],
+        missing_modules: list[str],
+    ):
+        # only the first of records with the same id is checked
+        if record_id in self.checked_records:
+            return
+        self.checked_records.add(record_id)
+        if (
+            record_id not in self.db_records
+            or self.db_records[record_id] != updated_date
+        ):
+            self.update_records.append(
+                {
+                    "record_id": record_id,
+                    "updated_date": updated_date,
+                    "repository_id": self.repo.id,
+                }
+            )
+        missing_items = [
+            missing_packages,
+            missing_modular_packages,
+            missing_modules,
+        ]
+        db_missing_items = self.db_results.get(record_id)
+        if any(missing_items):
+            self.failed_count += 1
+            if db_missing_items is None:
+                self.repo.check_result_delta.add_broken(record_id)
+            if missing_items != db_missing_items:
+                self.failed_records.append(
+                    {
+                        "repository_id": self.repo.id,
+                        "record_id": record_id,
+                        "missing_packages": missing_packages,
+                        "missing_modular_packages": missing_modular_packages,
+                        "missing_modules": missing_modules,
+                    }
+                )
+        elif db_missing_items is not None:
+            self.passed_records.append(record_id)
+            self.repo.check_result_delta.add_fixed(record_id)
+        if (
+            max(
+                len(self.update_records),
+                len(self.failed_records),
+                len(self.passed_records),
+            )
+            >= settings.db_batch_size
+        ):
+            self.flush()
+
+    def flush(self):
+        if self.update_records or self.failed_records or self.passed_records:
+            save_check_batch(
+                self.repo.id,
+                self.update_records,
+                self.failed_records,
+                self.passed_records,
+            )
+        self.update_records = []
+        self.failed_records = []
+        self.passed_records = []
+
+    def finish(self):
+        self.flush()
+        self.repo.check_result_checksum = get_check_result_checksum(
+            self.repo.id,
+        )
+        logging.info(
+            "(repo=%s) %d checked records are failed, %d are passed, "
+            "%d are newly broken, %d are fixed",
+            self.repo.full_name,
+            self.failed_count,
+            len(self.checked_records) - self.failed_count,
+            len(self.repo.check_result_delta.broken),
+            len(self.repo.check_result_delta.fixed),
+        )
+
+
+def check_repo_updateinfo(
+    repo: Repository,
+    updateinfo_records: Iterable[createrepo_c.UpdateRecord | UpdateRecord],
+    inventory: Inventory,
+    inventory_delta: InventoryDelta | None = None,
+):
+    writer = CheckResultWriter(repo)
+    affected_records = set()
+    if inventory_delta:
+        affected_records = get_affected_records(
+            repo.id,
+            inventory_delta.added,
+        )
+    for record in updateinfo_records:
+        db_updated_date = writer.db_records.get(record.id)
+        if (
+            db_updated_date
+            and db_updated_date == record.updated_date
+            and not is_record_affected(
+                record,
+                affected_records,
+                inventory_delta,
+            )
+        ):
             logging.info(
                 "(repo=%s) skipping %s record, updated_date is not changed",
                 repo.full_name,
                 record.id,
             )
             continue
-        if not db_record:
-            db_record = models.UpdateRecord(
-                record_id=record.id,
-                updated_date=record.updated_date,
-                repository_id=repo.id,
-            )
-        db_record.updated_date = record.updated_date
-
         logging.info(
             "(repo=%s) processing %s record",
             repo.full_name,
@@ -254,200 +1143,750 @@ def check_repo_updateinfo(
         for collection in record.collections:
             cr_module = collection.module
             modular = bool(cr_module)
-            modular_artifacts = []
+            modular_artifacts = frozenset()
             module_exist = False
             if modular:
                 module = Module.from_cr_updatemodule(cr_module)
-                repo_module = repo_modules.get(module.nvsca)
-                if repo_module:
+                repo_module_artifacts = inventory.modules.get(module.nvsca)
+                if repo_module_artifacts is not None:
                     module_exist = True
-                    modular_artifacts = repo_module.artifacts
+                    modular_artifacts = repo_module_artifacts
                 if not module_exist:
                     missing_modules.append(module.nvsca)
             for cr_package in collection.packages:
                 package = Package.from_cr_updatepackage(cr_package)
                 nevra = package.nevra
-                if nevra not in repo_packages:
+                if nevra not in inventory.packages:
                     missing_packages.append(nevra)
                 if modular and module_exist and nevra not in modular_artifacts:
                     missing_modular_packages.append(nevra)
-        records_to_add.append(db_record)
+        writer.add(
+            record.id,
+            record.updated_date,
+            missing_packages,
+            missing_modular_packages,
+            missing_modules,
+        )
+    writer.finish()
+
+
+def copy_rows(
+    session: Session,
+    table: Table,
+    rows: Iterable[tuple[str, ...]],
+):
+    # rows are spooled to a temporary file and loaded with COPY,
+    # values must not contain tabs, newlines or backslashes
+    with tempfile.SpooledTemporaryFile(
+        max_size=COPY_BUFFER_SIZE,
+        mode="w+",
+    ) as fd:
+        for row in rows:
+            fd.write("\t".join(row))
+            fd.write("\n")
+        fd.seek(0)
+        columns = ", ".join(column.name for column in table.columns)
+        with session.connection().connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table.name} ({columns}) FROM STDIN",
+                fd,
+            )
+
+
+def check_repo_updateinfo_sql(
+    repo: Repository,
+    updateinfo_records: Iterable[createrepo_c.UpdateRecord | UpdateRecord],
+    inventory: Inventory,
+    repository_ids: list[int],
+):
+    # packages of all records are checked with a single anti-join
+    # against repository_packages, modules are checked in memory
+    def iter_record_packages() -> Iterator[tuple[str, str, str]]:
+        position = 0
+        for record in updateinfo_records:
+            if record.id in checked_records:
+                continue
+            checked_records[record.id] = record.updated_date
+            missing_modules = []
+            missing_modular_packages = []
+            for collection in record.collections:
+                cr_module = collection.module
+                modular_artifacts = None
+                if cr_module:
+                    module = Module.from_cr_updatemodule(cr_module)
+                    modular_artifacts = inventory.modules.get(module.nvsca)
+                    if modular_artifacts is None:
+                        missing_modules.append(module.nvsca)
+                for cr_package in collection.packages:
+                    package = Package.from_cr_updatepackage(cr_package)
+                    nevra = package.nevra
+                    if (
+                        modular_artifacts is not None
+                        and nevra not in modular_artifacts
+                    ):
+                        missing_modular_packages.append(nevra)
+                    position += 1
+                    yield record.id, nevra, str(position)
+            if missing_modules or missing_modular_packages:
+                missing_module_items[record.id] = (
+                    missing_modules,
+                    missing_modular_packages,
+                )
 
+    writer = CheckResultWriter(repo)
+    checked_records = {}
+    missing_module_items = {}
+    staged_packages = models.UpdateRecordPackages.c
+    with get_session() as session:
+        models.UpdateRecordPackages.create(session.connection())
+        copy_rows(
+            session,
+            models.UpdateRecordPackages,
+            iter_record_packages(),
+        )
+        record_missing_packages = dict(
+            session.execute(
+                select(
+                    staged_packages.record_id,
+                    func.array_agg(
+                        aggregate_order_by(
+                            staged_packages.nevra,
+                            staged_packages.position,
+                        ),
+                    ),
+                )
+                .where(
+                    ~exists().where(
+                        models.RepositoryPackage.repository_id.in_(
+                            repository_ids,
+                        ),
+                        models.RepositoryPackage.nevra
+                        == staged_packages.nevra,
+                    )
+                )
+                .group_by(staged_packages.record_id)
+            ).all()
+        )
+        session.commit()
+    for record_id, updated_date in checked_records.items():
+        missing_modules, missing_modular_packages = missing_module_items.get(
+            record_id,
+            ([], []),
+        )
+        writer.add(
+            record_id,
+            updated_date,
+            record_missing_packages.get(record_id, []),
+            missing_modular_packages,
+            missing_modules,
+        )
+    writer.finish()
+
+
+def get_parse_executor() -> ProcessPoolExecutor:
+    # short-lived parse processes give memory of createrepo_c
+    # and libmodulemd back to the OS
+    mp_context = multiprocessing.get_context("forkserver")
+    mp_context.set_forkserver_preload(["updateinfo_monitor.utils"])
+    return ProcessPoolExecutor(
+        max_workers=settings.parse_workers,
+        mp_context=mp_context,
+        max_tasks_per_child=1,
+    )
+
+
+def parse_inventory(
+    cache_result: RepodataCacheResult,
+) -> tuple[Inventory, dict[str, float]]:
+    # runs in a parse process, phase timings are returned
+    # to be observed by metrics of the monitor process
+    timings = {}
+    start = time.perf_counter()
+    packages = cache_result.parse_packages(primary_only=True)
+    timings["parse_packages"] = time.perf_counter() - start
+    start = time.perf_counter()
+    modules = cache_result.parse_modules()
+    timings["parse_modules"] = time.perf_counter() - start
+    inventory = Inventory.construct(
+        checksum=cache_result.repomd_checksum,
+        packages=packages,
+        modules=modules,
+    )
+    return inventory, timings
+
+
+def load_repository_inventory(
+    cache_result: RepodataCacheResult,
+    repository_id: int,
+) -> tuple[Inventory, dict[str, float]]:
+    # runs in a parse process, packages are loaded into repository_packages
+    # only when primary checksum is changed and just modules are returned
+    timings = {}
+    primary_record = cache_result.get_repomd_record("primary")
+    if not primary_record:
+        raise ValueError(
+            "Cannot load packages, primary repomd record is missing",
+        )
+    packages_checksum = select(models.Repository.packages_checksum).where(
+        models.Repository.id == repository_id,
+    )
+    with get_session() as session:
+        packages_changed = (
+            session.execute(packages_checksum).scalar()
+            != primary_record.checksum
+        )
+    # primary is parsed before the repository row is locked,
+    # so the lock doesn't block lease renewals during parsing
+    if packages_changed:
+        start = time.perf_counter()
+        packages = cache_result.parse_packages(primary_only=True)
+        timings["parse_packages"] = time.perf_counter() - start
+    with get_session() as session:
         if (
-            not missing_modules
-            and not missing_modular_packages
-            and not missing_packages
+            packages_changed
+            and session.execute(
+                packages_checksum.with_for_update(),
+            ).scalar()
+            != primary_record.checksum
         ):
-            repo_check_results.pop(record.id, None)
-            continue
-        repo_check_results[record.id] = {
-            "missing_packages": missing_packages,
-            "missing_modular_packages": missing_modular_packages,
-            "missing_modules": missing_modules,
-        }
-    repo.check_result = repo_check_results
-    with get_session() as session:
-        session.add_all(records_to_add)
+            start = time.perf_counter()
+            session.execute(
+                delete(models.RepositoryPackage).where(
+                    models.RepositoryPackage.repository_id == repository_id,
+                )
+            )
+            copy_rows(
+                session,
+                models.RepositoryPackage.__table__,
+                ((str(repository_id), nevra) for nevra in packages),
+            )
+            session.execute(
+                update(models.Repository)
+                .where(models.Repository.id == repository_id)
+                .values(packages_checksum=primary_record.checksum)
+            )
+            timings["load_packages"] = time.perf_counter() - start
         session.commit()
+    start = time.perf_counter()
+    modules = cache_result.parse_modules()
+    timings["parse_modules"] = time.perf_counter() - start
+    inventory = Inventory.construct(
+        checksum=cache_result.repomd_checksum,
+        modules=modules,
+    )
+    return inventory, timings
+
+
+def parse_old_repodata(
+    cache_result: RepodataCacheResult,
+) -> tuple[Inventory, dict[str, float]]:
+    inventory, timings = parse_inventory(cache_result)
+    cache_result.save_snapshot(inventory)
+    return inventory, timings
+
+
+def submit_old_repodata_parse(
+    executor: ProcessPoolExecutor,
+    repo: Repository,
+    cache_result: RepodataCacheResult,
+) -> Future:
+    if settings.check_backend == "sql":
+        return executor.submit(
+            load_repository_inventory,
+            cache_result,
+            repo.id,
+        )
+    snapshot = cache_result.load_snapshot()
+    if not snapshot:
+        return executor.submit(parse_old_repodata, cache_result)
     logging.info(
-        "(repo=%s) repo_check_results:\n%s",
-        repo.full_name,
-        pprint.pformat(repo_check_results),
+        "(%s.%s) Loaded parsed repodata snapshot",
+        cache_result.repo_name,
+        cache_result.repo_arch,
     )
+    future = Future()
+    future.set_result((snapshot, {}))
+    return future
+
+
+def get_parse_result(future: Future) -> Inventory:
+    inventory, timings = future.result()
+    for phase, duration in timings.items():
+        INDEX_PHASE_DURATION.labels(phase).observe(duration)
+    return inventory
 
 
-def index_repo(repo: Repository):
+def index_repo(repo: Repository, force: bool = False):
     cache_result = update_repodata_cache(repo)
+    repo.check_interval = get_check_interval(repo, cache_result.changed)
     if not cache_result.changed:
         logging.info("%s metadata is not changed, skipping it", repo.full_name)
+        repo.set_repomd_validators(cache_result.repomd_validators)
         return
+    repo.metadata_changed_ts = datetime.datetime.utcnow()
     updateinfo_record = cache_result.get_repomd_record("updateinfo")
     if not updateinfo_record:
         raise ValueError("Cannot parse updatinfo, updateinfo.xml is missing")
-    updateinfo = updateinfo_from_file(updateinfo_record.path)
-    repo_packages = cache_result.parse_packages()
-    repo_modules = cache_result.parse_modules()
+    old_repo_cache_results = []
     for old_repo in repo.old_repositories:
         try:
-            old_repo_cache_result = update_repodata_cache(old_repo)
-            repo_packages.update(old_repo_cache_result.parse_packages())
-            repo_modules.update(old_repo_cache_result.parse_modules())
+            old_repo_cache_results.append(
+                (old_repo, update_repodata_cache(old_repo)),
+            )
         except Exception:
             logging.exception(
-                "(%s) Cannot parse old repodata:",
+                "(%s) Cannot update old repodata:",
                 old_repo.full_name,
             )
-            continue
-        old_repo.repomd_checksum = old_repo_cache_result.repomd_checksum
-        update_repo_values(old_repo)
-    check_repo_updateinfo(
-        repo=repo,
-        updateinfo=updateinfo,
-        repo_packages=repo_packages,
-        repo_modules=repo_modules,
-    )
+    # current and old repositories are parsed in parallel processes
+    with get_parse_executor() as executor:
+        if settings.check_backend == "sql":
+            inventory_future = executor.submit(
+                load_repository_inventory,
+                cache_result,
+                repo.id,
+            )
+        else:
+            inventory_future = executor.submit(parse_inventory, cache_result)
+        old_repo_futures = [
+            (
+                old_repo,
+                old_repo_cache_result,
+                submit_old_repodata_parse(
+                    executor,
+                    old_repo,
+                    old_repo_cache_result,
+                ),
+            )
+            for old_repo, old_repo_cache_result in old_repo_cache_results
+        ]
+        inventory = get_parse_result(inventory_future)
+        repository_ids = [repo.id]
+        for old_repo, old_repo_cache_result, future in old_repo_futures:
+            try:
+                inventory.update(get_parse_result(future))
+            except Exception:
+                logging.exception(
+                    "(%s) Cannot parse old repodata:",
+                    old_repo.full_name,
+                )
+                continue
+            repository_ids.append(old_repo.id)
+            old_repo.repomd_checksum = old_repo_cache_result.repomd_checksum
+            old_repo.set_repomd_validators(
+                old_repo_cache_result.repomd_validators,
+            )
+            update_repo_values(old_repo)
+    if settings.check_backend == "sql":
+        with time_phase("check_updateinfo"):
+            check_repo_updateinfo_sql(
+                repo=repo,
+                updateinfo_records=iter_repo_updateinfo(
+                    updateinfo_record.path,
+                ),
+                inventory=inventory,
+                repository_ids=repository_ids,
+            )
+        repo.repomd_checksum = cache_result.repomd_checksum
+        repo.set_repomd_validators(cache_result.repomd_validators)
+        return
+    inventory_delta = None
+    # without inventory delta every record is checked again
+    previous_inventory = None
+    if not force:
+        previous_inventory = Inventory.load(cache_result.inventory_path)
+    if previous_inventory:
+        inventory_delta = inventory.diff(previous_inventory)
+        logging.info(
+            "(%s) Inventory delta: %d added, %d removed items",
+            repo.full_name,
+            len(inventory_delta.added),
+            len(inventory_delta.removed),
+        )
+    with time_phase("check_updateinfo"):
+        check_repo_updateinfo(
+            repo=repo,
+            updateinfo_records=iter_repo_updateinfo(updateinfo_record.path),
+            inventory=inventory,
+            inventory_delta=inventory_delta,
+        )
+    inventory.save(cache_result.inventory_path)
     repo.repomd_checksum = cache_result.repomd_checksum
+    repo.set_repomd_validators(cache_result.repomd_validators)
+
+
+def get_repos_to_sweep() -> list[Repository]:
+    now = datetime.datetime.utcnow()
+    query = (
+        select(models.Repository)
+        .where(
+            models.Repository.is_old.is_(False),
+            models.Repository.is_active.is_(True),
+            models.Repository.needs_index.is_(False),
+            models.Repository.next_check_ts.is_(None)
+            | (models.Repository.next_check_ts <= now),
+            models.Repository.lease_expires_at.is_(None)
+            | (models.Repository.lease_expires_at < now),
+        )
+        .options(noload(models.Repository.old_repositories))
+    )
+    with get_session() as session:
+        return [
+            Repository.from_orm(db_repo)
+            for db_repo in session.execute(query).scalars().all()
+        ]
+
+
+def is_repomd_changed(repo: Repository) -> bool:
+    try:
+        with get_http_session().get(
+            get_repomd_url(repo),
+            headers=repo.repomd_validators.request_headers(),
+            timeout=get_http_timeout(),
+        ) as response:
+            response.raise_for_status()
+            if response.status_code == requests.codes.not_modified:
+                return False
+            repomd_checksum = hashlib.sha256(response.content).hexdigest()
+            return repomd_checksum != repo.repomd_checksum
+    except Exception:
+        # repository is passed to indexing to record the error
+        logging.exception("(%s) Cannot check repomd.xml:", repo.full_name)
+        return True
+
+
+def sweep_repositories():
+    with get_session() as session:
+        locked = session.execute(
+            select(func.pg_try_advisory_xact_lock(SWEEP_LOCK_ID)),
+        ).scalar()
+        if not locked:
+            logging.debug("Repositories are swept by another process")
+            return
+        repos = get_repos_to_sweep()
+        if not repos:
+            return
+        with ThreadPoolExecutor(
+            max_workers=settings.sweep_workers,
+            thread_name_prefix="sweep",
+        ) as executor:
+            changes = list(executor.map(is_repomd_changed, repos))
+        now = datetime.datetime.utcnow()
+        values = []
+        for repo, changed in zip(repos, changes):
+            if changed:
+                values.append({"id": repo.id, "needs_index": True})
+                continue
+            check_interval = get_check_interval(repo, metadata_changed=False)
+            values.append(
+                {
+                    "id": repo.id,
+                    "check_ts": now,
+                    "next_check_ts": now
+                    + datetime.timedelta(minutes=check_interval),
+                    "check_interval": check_interval,
+                }
+            )
+        session.execute(update(models.Repository), values)
+        session.commit()
+    logging.info(
+        "Swept %d repositories, %d of them are changed",
+        len(repos),
+        sum(changes),
+    )
 
 
 def init_slack_client() -> WebClient:
-    return WebClient(
+    slack_client = WebClient(
         token=settings.slack_bot_token,
     )
+    slack_client.retry_handlers.append(
+        RateLimitErrorRetryHandler(max_retry_count=settings.slack_retries),
+    )
+    return slack_client
 
 
-def send_notification(repo: Repository, slack_client: WebClient):
-    if not repo.check_result or not settings.slack_notifications_enabled:
-        logging.debug(
-            "Skip sending notification, check_result field is empty "
-            "or sending notifications is disabled",
-        )
-        return
-    formatted_content = pprint.pformat(repo.check_result)
-    check_result_checksum = get_string_checksum(formatted_content)
-    if check_result_checksum == repo.check_result_checksum:
-        logging.debug(
-            "Skip sending notification, check_result_checksum is not changed",
-        )
-        return
-    try:
+def format_notification(deltas: dict[str, CheckResultDelta]) -> str:
+    lines = []
+    for repo_name, check_result_delta in sorted(deltas.items()):
+        lines.append(f"*{repo_name}*")
+        if check_result_delta.broken:
+            broken = ", ".join(sorted(check_result_delta.broken))
+            lines.append(f"Newly broken: {broken}")
+        if check_result_delta.fixed:
+            fixed = ", ".join(sorted(check_result_delta.fixed))
+            lines.append(f"Fixed: {fixed}")
+    return "\n".join(lines)
+
+
+def send_notification(
+    slack_client: WebClient,
+    deltas: dict[str, CheckResultDelta],
+):
+    summary = f"Check results are changed in {len(deltas)} repositories"
+    content = format_notification(deltas)
+    # long digests don't fit into a message and are uploaded as a file
+    if len(content) > SLACK_MESSAGE_LENGTH:
         result = slack_client.files_upload_v2(
             channel=settings.slack_channel_id,
-            filename=f"{repo.full_name}_result.json",
-            initial_comment=f"Check results for *{repo.full_name}* repository",
-            content=formatted_content,
+            filename="check_results_digest.txt",
+            initial_comment=summary,
+            content=content,
         )
-        repo.check_result_checksum = check_result_checksum
-        logging.debug("SlackApi response:\n%s", result)
-    except SlackApiError:
-        logging.exception(
-            "Cannot post message to slack channel: %s",
-            settings.slack_channel_id,
-        )
-
-
-def load_repositories_from_file(filepath: Path):
-    def process_repo() -> models.Repository:
-        repo_url = repo.url.replace("$basearch", repo.arch)
-        if repo.arch == "i686":
-            repo_url = repo_url.replace("/almalinux/", "/vault/")
-        repo_obj = repos_mapping.get(repo.full_name)
-        if not repo_obj:
-            repo_obj = models.Repository(**repo.dict_for_create())
-        for attr, value in (
-            ("url", repo_url),
-            ("debuginfo", repo.debuginfo),
-        ):
-            setattr(repo_obj, attr, value)
-        repos_to_add.append(repo_obj)
-        return repo_obj
+    else:
+        result = slack_client.chat_postMessage(
+            channel=settings.slack_channel_id,
+            text=f"{summary}\n{content}",
+        )
+    logging.debug("SlackApi response:\n%s", result)
+
 
-    def process_old_repo():
-        repo_name = repo_obj.name.replace(
-            f"-{distr.version}-",
-            f"-{old_version}-",
+def get_desired_repositories(
+    filepath: Path,
+) -> tuple[dict[tuple[str, str], dict], set[tuple]]:
+    def add_repo(repo_url: str) -> tuple[str, str] | None:
+        key = (repo.name, repo.arch)
+        if key in repos:
+            logging.warning(
+                "Repository %s.%s is listed more than once in %s, "
+                "the first entry is used",
+                repo.name,
+                repo.arch,
+                filepath,
+            )
+            return
+        repos[key] = {
+            "url": repo_url,
+            "debuginfo": repo.debuginfo,
+            "repodata_types": repo.repodata_types,
+            "priority": repo.priority,
+            "distribution": distr.name,
+            "is_old": False,
+            "is_active": True,
+        }
+        return key
+
+    def add_old_repo(repo_key: tuple[str, str], repo_url: str):
+        old_key = (
+            repo.name.replace(f"-{distr.version}-", f"-{old_version}-"),
+            repo.arch,
         )
-        repo_url = repo_obj.url.replace("/almalinux/", "/vault/").replace(
-            f"/{distr.version}/",
-            f"/{old_version}/",
+        repos.setdefault(
+            old_key,
+            {
+                "url": repo_url.replace("/almalinux/", "/vault/").replace(
+                    f"/{distr.version}/",
+                    f"/{old_version}/",
+                ),
+                "debuginfo": repo.debuginfo,
+                "repodata_types": repo.repodata_types,
+                "priority": 0,
+                "distribution": distr.name,
+                "is_old": True,
+                "is_active": True,
+            },
         )
-        old_repo_obj = next(
-            (
-                old_repo
-                for old_repo in repo_obj.old_repositories
-                if old_repo.name == repo_name
-                and old_repo.arch == repo_obj.arch
-            ),
-            None,
-        )
-        if not old_repo_obj:
-            old_repo_obj = models.Repository(
-                name=repo_name,
-                arch=repo_obj.arch,
-                url=repo_url,
-                debuginfo=repo_obj.debuginfo,
-                is_old=True,
-            )
-        for attr, value in (
-            ("url", repo_url),
-            ("debuginfo", repo.debuginfo),
-        ):
-            setattr(old_repo_obj, attr, value)
-        repo_obj.old_repositories.append(old_repo_obj)
-        repos_to_add.append(old_repo_obj)
+        links.add((repo_key, old_key))
 
-    repos_to_add = []
+    repos = {}
+    links = set()
     with open(filepath, "rb") as fd:
         data = yaml.safe_load(fd)
-        repos_mapping = {}
-        with get_session() as session:
-            db_repos = (
-                session.execute(
-                    select(models.Repository).options(
-                        joinedload(models.Repository.old_repositories),
+    for distr in data:
+        distr = Distribution(**distr)
+        repo_arches = [
+            (
+                repo,
+                [
+                    arch
+                    for arch in distr.arches
+                    if arch not in repo.exclude_arch
+                ],
+            )
+            for repo in distr.repositories
+        ]
+        repo_arches.extend((repo, ["src"]) for repo in distr.sources)
+        for repo, arches in repo_arches:
+            for arch in arches:
+                repo.arch = arch
+                repo_url = repo.url.replace("$basearch", repo.arch)
+                if repo.arch == "i686":
+                    repo_url = repo_url.replace("/almalinux/", "/vault/")
+                repo_key = add_repo(repo_url)
+                if not repo_key:
+                    continue
+                for old_version in distr.old_versions:
+                    add_old_repo(repo_key, repo_url)
+    return repos, links
+
+
+def load_repositories_from_file(
+    filepath: Path,
+    dry_run: bool = False,
+) -> RepositorySyncDiff:
+    repos, links = get_desired_repositories(filepath)
+    diff = RepositorySyncDiff()
+    with get_session() as session:
+        db_repos = {}
+        duplicates = {}
+        for row in session.execute(
+            select(
+                models.Repository.id,
+                models.Repository.name,
+                models.Repository.arch,
+                models.Repository.url,
+                models.Repository.debuginfo,
+                models.Repository.repodata_types,
+                models.Repository.priority,
+                models.Repository.distribution,
+                models.Repository.is_old,
+                models.Repository.is_active,
+            ).order_by(
+                models.Repository.is_active.desc(),
+                models.Repository.id,
+            )
+        ):
+            row = row._asdict()
+            key = (row.pop("name"), row.pop("arch"))
+            repo_id = row.pop("id")
+            # previous loader could store the same repository twice,
+            # the first active row is kept and the others are duplicates
+            if key in db_repos:
+                duplicates[repo_id] = (key, row["is_active"])
+                continue
+            diff.repository_ids[key] = repo_id
+            db_repos[key] = row
+        repo_keys = {
+            repo_id: key for key, repo_id in diff.repository_ids.items()
+        }
+        db_links = set()
+        linked_duplicate_ids = set()
+        for repo_id, old_repo_id in session.execute(
+            select(
+                models.OldRepositories.c.repository_id,
+                models.OldRepositories.c.old_repository_id,
+            )
+        ):
+            if repo_id in duplicates or old_repo_id in duplicates:
+                linked_duplicate_ids.update((repo_id, old_repo_id))
+                continue
+            db_links.add((repo_keys[repo_id], repo_keys[old_repo_id]))
+        diff.duplicates = {
+            repo_id: key
+            for repo_id, (key, is_active) in duplicates.items()
+            if is_active or repo_id in linked_duplicate_ids
+        }
+        for key, values in repos.items():
+            db_values = db_repos.get(key)
+            if db_values is None:
+                diff.inserted[key] = values
+                continue
+            changes = {
+                column: (db_values[column], value)
+                for column, value in values.items()
+                if db_values[column] != value
+            }
+            if changes:
+                diff.updated[key] = changes
+        diff.deactivated = {
+            key
+            for key, db_values in db_repos.items()
+            if key not in repos and db_values["is_active"]
+        }
+        diff.linked = links - db_links
+        diff.unlinked = db_links - links
+        if dry_run or not diff:
+            return diff
+        if diff.inserted:
+            inserted_ids = session.execute(
+                insert(models.Repository).returning(
+                    models.Repository.id,
+                    models.Repository.name,
+                    models.Repository.arch,
+                ),
+                [
+                    {"name": name, "arch": arch, **values}
+                    for (name, arch), values in diff.inserted.items()
+                ],
+            )
+            for repo_id, name, arch in inserted_ids:
+                diff.repository_ids[(name, arch)] = repo_id
+        if diff.updated:
+            session.execute(
+                update(models.Repository),
+                [
+                    {
+                        "id": diff.repository_ids[key],
+                        **{
+                            column: value
+                            for column, (_, value) in changes.items()
+                        },
+                    }
+                    for key, changes in diff.updated.items()
+                ],
+            )
+        if diff.deactivated:
+            session.execute(
+                update(models.Repository)
+                .where(
+                    models.Repository.id.in_(
+                        diff.repository_ids[key] for key in diff.deactivated
+                    ),
+                )
+                .values(is_active=False)
+            )
+        if diff.unlinked:
+            session.execute(
+                delete(models.OldRepositories).where(
+                    tuple_(
+                        models.OldRepositories.c.repository_id,
+                        models.OldRepositories.c.old_repository_id,
+                    ).in_(
+                        (
+                            diff.repository_ids[repo_key],
+                            diff.repository_ids[old_repo_key],
+                        )
+                        for repo_key, old_repo_key in diff.unlinked
                     )
                 )
-                .scalars()
-                .all()
-            )
-            repos_mapping.update({repo.full_name: repo for repo in db_repos})
-            for distr in data:
-                distr = Distribution(**distr)
-                logging.info(
-                    "Adding/updating %s distribution configuration",
-                    distr.name,
+            )
+        if diff.duplicates:
+            session.execute(
+                delete(models.OldRepositories).where(
+                    or_(
+                        models.OldRepositories.c.repository_id.in_(
+                            diff.duplicates,
+                        ),
+                        models.OldRepositories.c.old_repository_id.in_(
+                            diff.duplicates,
+                        ),
+                    )
                 )
-                for repo in distr.repositories:
-                    for arch in distr.arches:
-                        if arch in repo.exclude_arch:
-                            continue
-                        repo.arch = arch
-                        repo_obj = process_repo()
-                        for old_version in distr.old_versions:
-                            process_old_repo()
-                for repo in distr.sources:
-                    repo.arch = "src"
-                    repo_obj = process_repo()
-                    for old_version in distr.old_versions:
-                        process_old_repo()
-            session.add_all(repos_to_add)
-            session.commit()
+            )
+            session.execute(
+                update(models.Repository)
+                .where(models.Repository.id.in_(diff.duplicates))
+                .values(is_active=False)
+            )
+        if diff.linked:
+            session.execute(
+                insert(models.OldRepositories),
+                [
+                    {
+                        "repository_id": diff.repository_ids[repo_key],
+                        "old_repository_id": diff.repository_ids[old_repo_key],
+                    }
+                    for repo_key, old_repo_key in diff.linked
+                ],
+            )
+        session.commit()
+    api_cache.clear()
+    logging.info(
+        "Repositories are synced: %d inserted, %d updated, %d deactivated, "
+        "%d duplicates deactivated",
+        len(diff.inserted),
+        len(diff.updated),
+        len(diff.deactivated),
+        len(diff.duplicates),
+    )
+    return diff